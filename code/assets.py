@@ -0,0 +1,132 @@
+"""
+Shared asset manager. Every image is decoded from disk once and the
+converted surface is handed out to all sprites that ask for it.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import pygame
+
+# Images the game needs before the first level can be built
+MANIFEST = [
+    "img/things_spritesheet2.png",
+    "img/player.png",
+    "img/husband.png",
+    "img/husband2.png",
+    "img/background_01.png",
+]
+
+# Default memory budget for decoded surfaces, in bytes
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+
+def surface_size(surface):
+    """ Approximate number of bytes held by a surface. """
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class AssetManager(object):
+    """ Loads each image exactly once and keeps the converted surfaces
+        under a memory budget, dropping the least recently used ones
+        when the budget is exceeded. """
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.size = 0
+        # file name -> load/convert time in seconds
+        self.timings = {}
+
+        # Converted surfaces, least recently used first
+        self._surfaces = OrderedDict()
+        # Surfaces decoded by the preload thread, not converted yet
+        self._loaded = {}
+        # file name -> event set once the preload thread is done with it
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def preload(self, manifest=MANIFEST, background=False):
+        """ Decode every file in the manifest. With background=True the
+            files are decoded on a worker thread and this returns at once;
+            get() will wait for a file that is still being decoded. """
+        manifest = [name for name in manifest if name not in self._surfaces]
+        if not background:
+            for file_name in manifest:
+                self.get(file_name)
+            return
+
+        with self._lock:
+            for file_name in manifest:
+                self._pending[file_name] = threading.Event()
+        self._thread = threading.Thread(target=self._preload_worker, args=(manifest,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _preload_worker(self, manifest):
+        for file_name in manifest:
+            start = time.time()
+            try:
+                image = pygame.image.load(file_name)
+            except pygame.error:
+                image = None
+            with self._lock:
+                if image is not None:
+                    self._loaded[file_name] = image
+                    self.timings[file_name] = time.time() - start
+                self._pending.pop(file_name).set()
+
+    def wait(self):
+        """ Block until the background preload has finished. """
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def get(self, file_name):
+        """ Return the converted surface for the file, loading it if
+            this is the first time it is asked for. """
+        surface = self._surfaces.get(file_name)
+        if surface is not None:
+            # Mark as most recently used
+            del self._surfaces[file_name]
+            self._surfaces[file_name] = surface
+            return surface
+
+        with self._lock:
+            pending = self._pending.get(file_name)
+        if pending:
+            pending.wait()
+
+        start = time.time()
+        with self._lock:
+            image = self._loaded.pop(file_name, None)
+        if image is None:
+            image = pygame.image.load(file_name)
+        # Converting needs the display, so it always happens on this thread
+        surface = image.convert()
+        self.timings[file_name] = self.timings.get(file_name, 0) + time.time() - start
+
+        self._surfaces[file_name] = surface
+        self.size += surface_size(surface)
+        self._evict()
+        return surface
+
+    def _evict(self):
+        """ Drop least recently used surfaces until we fit the budget.
+            The most recently used surface is always kept. """
+        while self.size > self.budget and len(self._surfaces) > 1:
+            file_name, surface = self._surfaces.popitem(last=False)
+            self.size -= surface_size(surface)
+
+    def report(self):
+        """ Lines describing how long every asset took to load. """
+        lines = []
+        for file_name in sorted(self.timings):
+            lines.append("%-32s %7.1f ms" % (file_name, self.timings[file_name] * 1000))
+        lines.append("%-32s %7.1f ms" % ("total", sum(self.timings.values()) * 1000))
+        lines.append("%-32s %7.1f KB" % ("resident", self.size / 1024.0))
+        return lines
+
+
+# The manager shared by the whole game
+assets = AssetManager()
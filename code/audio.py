@@ -0,0 +1,222 @@
+"""
+Music and sound effects.
+
+Background tracks are streamed by pygame.mixer.music, which decodes
+them a bit at a time while they play instead of holding the whole track
+in memory. Sound effects are read straight out of the zip they ship in:
+the archive is opened once and each effect is read from its place in it
+the first time it is needed. Reading and decoding happen on a worker
+thread, so asking for a sound never stalls a frame; a sound that isn't
+decoded yet starts as soon as it is. Decoded sounds are kept under a
+memory budget, the least recently used ones are dropped first.
+
+Every effect has a priority. When all channels are busy, a sound can
+cut off the lowest priority one playing, if that is lower than its own.
+"""
+import io
+import threading
+import zipfile
+from collections import OrderedDict
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import pygame
+
+import constants
+from events import bus
+
+SFX_ARCHIVE = "resources/8_BIT_[50_SFX]_Jump_Free_Sound_Effects_N1_BY_jalastram.zip"
+SFX_FOLDER = "8_BIT_[50_SFX]_Jump_Free_Sound_Effects_N1_BY_jalastram/"
+
+# Event topic -> (effect in the archive, priority)
+EFFECTS = {
+    constants.JUMP_EVENT: ("SFX_Jump_01.wav", 1),
+    constants.DOOR_EVENT: ("SFX_Jump_13.wav", 1),
+    constants.WARDROBE_EVENT: ("SFX_Jump_22.wav", 2),
+    constants.CHANDELIER_EVENT: ("SFX_Jump_07.wav", 3),
+}
+
+CHANNELS = 8
+# Default memory budget for decoded effects, in bytes
+DEFAULT_BUDGET = 4 * 1024 * 1024
+# A sound still waiting to be decoded after this many seconds is dropped
+MAX_DELAY = 0.25
+
+
+def sound_size(sound):
+    """ Approximate number of bytes held by a decoded sound. """
+    frequency, size, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+
+class SoundBank(object):
+    """ Effects read from a zip archive on a worker thread and kept
+        under a memory budget. """
+
+    def __init__(self, archive=SFX_ARCHIVE, folder=SFX_FOLDER, budget=DEFAULT_BUDGET):
+        self.folder = folder
+        self.budget = budget
+        self.size = 0
+        # The central directory is read once, members are then read from
+        # their offsets on demand
+        self._zip = zipfile.ZipFile(archive)
+        # Decoded sounds, least recently used first
+        self._sounds = OrderedDict()
+        # Sounds decoded by the worker, not handed out yet
+        self._loaded = {}
+        self._requested = set()
+        # Sounds that couldn't be read, not tried again
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._work)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            name = self._queue.get()
+            if name is None:
+                return
+            try:
+                data = self._zip.read(self.folder + name)
+                sound = pygame.mixer.Sound(file=io.BytesIO(data))
+            except Exception as error:
+                # Anything from a missing member to a corrupt archive;
+                # the worker has to survive it or no sound loads again
+                print("can't load sound %s: %s" % (name, error))
+                sound = None
+            with self._lock:
+                self._loaded[name] = sound
+
+    def request(self, name):
+        """ Start decoding a sound unless it is decoded or on its way. """
+        with self._lock:
+            if name in self._sounds or name in self._loaded or name in self._requested or name in self._failed:
+                return
+            self._requested.add(name)
+        self._queue.put(name)
+
+    def get(self, name):
+        """ The decoded sound, or None if it isn't ready yet. Never blocks
+            on decoding. """
+        sound = self._sounds.get(name)
+        if sound is not None:
+            self._sounds.pop(name)
+            self._sounds[name] = sound
+            return sound
+
+        with self._lock:
+            if name not in self._loaded:
+                return None
+            sound = self._loaded.pop(name)
+            self._requested.discard(name)
+            if sound is None:
+                self._failed.add(name)
+                return None
+
+        self._sounds[name] = sound
+        self.size += sound_size(sound)
+        while self.size > self.budget and len(self._sounds) > 1:
+            old_name, old_sound = self._sounds.popitem(last=False)
+            self.size -= sound_size(old_sound)
+        return sound
+
+    def close(self):
+        self._queue.put(None)
+
+
+class Audio(object):
+    """ The mixer: music, effects and which channel plays what. """
+
+    def __init__(self):
+        self.enabled = False
+        self.bank = None
+        self._channels = []
+        # Priority of the sound each channel plays
+        self._priorities = []
+        # (name, priority, time asked for) of sounds still decoding
+        self._waiting = []
+
+    def init(self, archive=SFX_ARCHIVE):
+        """ Set up the channels and the sound bank. Without a working
+            mixer the game just stays silent. """
+        try:
+            pygame.mixer.init()
+        except pygame.error as error:
+            print("no sound: %s" % error)
+            return
+        pygame.mixer.set_num_channels(CHANNELS)
+        self._channels = [pygame.mixer.Channel(i) for i in range(CHANNELS)]
+        self._priorities = [0] * CHANNELS
+        self.bank = SoundBank(archive)
+        for name, priority in EFFECTS.values():
+            self.bank.request(name)
+        self.enabled = True
+
+    def listen(self, audible=None):
+        """ Play the effects of the game events, see EFFECTS. audible is
+            called with each Noise and says if the player can hear it.
+            Call after the game is created, it resets the event bus. """
+        for topic, (name, priority) in EFFECTS.items():
+            bus.subscribe(topic, self._handler(name, priority, audible))
+
+    def _handler(self, name, priority, audible):
+        def handle(noise):
+            if audible is None or audible(noise):
+                self.play(name, priority)
+        return handle
+
+    def play_music(self, file_name, loops=-1):
+        """ Stream a track in the background. """
+        if not self.enabled:
+            return
+        try:
+            pygame.mixer.music.load(file_name)
+            pygame.mixer.music.play(loops)
+        except pygame.error as error:
+            print("can't play %s: %s" % (file_name, error))
+
+    def play(self, name, priority=0):
+        if not self.enabled:
+            return
+        sound = self.bank.get(name)
+        if sound is None:
+            self.bank.request(name)
+            self._waiting.append((name, priority, pygame.time.get_ticks()))
+            return
+        i = self._channel(priority)
+        if i is not None:
+            self._priorities[i] = priority
+            self._channels[i].play(sound)
+
+    def _channel(self, priority):
+        """ Index of a free channel, or of the busy one with the lowest
+            priority below the given one, or None. """
+        lowest = None
+        for i, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                return i
+            if self._priorities[i] < priority and (lowest is None or self._priorities[i] < self._priorities[lowest]):
+                lowest = i
+        return lowest
+
+    def update(self):
+        """ Start the sounds that finished decoding. Call once a frame. """
+        if not self._waiting:
+            return
+        now = pygame.time.get_ticks()
+        waiting, self._waiting = self._waiting, []
+        for name, priority, asked in waiting:
+            if now - asked > MAX_DELAY * 1000:
+                continue
+            if self.bank.get(name) is not None:
+                self.play(name, priority)
+            else:
+                self._waiting.append((name, priority, asked))
+
+
+# The mixer shared by the whole game
+audio = Audio()
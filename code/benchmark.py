@@ -0,0 +1,261 @@
+"""
+Frame benchmark on synthetic stress levels.
+
+Each scenario generates an ASCII map of floors full of doors, wardrobes,
+stairs, clothes and guards, several times the size of Level01, and runs
+it headless for a fixed number of ticks, after a few warm-up ticks that
+aren't measured (the first draw builds the static layer). Update and
+draw times are measured per tick and reported as p50/p99, then compared
+against a stored baseline:
+
+    python benchmark.py --save-baseline   # record a baseline
+    python benchmark.py                   # compare with bench_baseline.json
+
+The baseline holds the timings of the machine it was saved on, so it is
+a local file and isn't committed: save one before a change and compare
+after it.
+
+Exits with status 1 when the p50 of update or draw is worse than the
+baseline by more than the tolerance. The p99s depend on what else the
+machine is doing, a tick that loses the CPU for a few ms lands there, so
+they are only shown as notes.
+
+The "gc growth" column is the net change per tick in the number of
+objects the garbage collector tracks. It isn't the number of
+allocations: objects freed during the tick cancel out, and objects the
+collector doesn't track, like numbers, strings and Rects, never count.
+It only hints at containers piling up, so it is reported but not
+compared.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+from timeit import default_timer
+
+import constants
+import headless
+import levels
+from assets import assets
+from game import Game
+from husband import Husband
+from renderer import FullRenderer
+from timing import sim_clock
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# Columns of one copy of the building, about as wide as Level01
+SECTION_WIDTH = 39
+FLOORS = 3
+
+# name -> (sections, guards)
+SCENARIOS = [
+    ("level01", 1, 5),
+    ("wide10", 10, 40),
+    ("wide100", 100, 100),
+]
+
+# Interactive tiles scattered over the floors and how often they appear
+FURNITURE = "DDsscblwj"
+FURNITURE_CHANCE = 0.25
+
+# Every this many ticks the player is moved ten tiles on, so the camera
+# keeps scrolling over new parts of the level
+TOUR_INTERVAL = 120
+# Ticks run before measuring
+WARMUP_TICKS = 60
+# Metrics that fail the check when they get worse than the baseline
+COMPARED = ("update_p50", "draw_p50")
+# Metrics that are only reported when they do
+NOTED = ("update_p99", "draw_p99")
+
+
+def generate_map(sections, seed=0):
+    """ An ASCII map of FLOORS floors, sections * SECTION_WIDTH wide,
+        with stairs between neighbouring floors in every section. """
+    rnd = random.Random(seed)
+    width = sections * SECTION_WIDTH
+    rows = []
+    for floor in range(FLOORS):
+        row = [' '] * width
+        for x in range(1, width - 1):
+            if rnd.random() < FURNITURE_CHANCE:
+                row[x] = rnd.choice(FURNITURE)
+        rows.append(row)
+
+    # Stairs between floor f and f + 1 use digits 1-5 or 6-0 in turn,
+    # so the compiler pairs every digit with the one on the next floor
+    for floor in range(FLOORS - 1):
+        digits = "12345" if floor % 2 == 0 else "67890"
+        for section in range(sections):
+            left = section * SECTION_WIDTH
+            for i, digit in enumerate(digits):
+                column = left + 2 + i * 7
+                rows[floor][column] = digit
+                rows[floor + 1][column + 3] = digit
+
+    # A chandelier per section, on the top floor
+    for section in range(sections):
+        rows[0][section * SECTION_WIDTH + 20] = 'z'
+
+    lines = [""]
+    for row in rows:
+        lines.append('#' * width)
+        lines.append('#' + "".join(row[1:-1]) + '#')
+    lines.append('#' * width)
+    return "\n".join(lines)
+
+
+def synthetic_level(txt):
+    """ A Level subclass built from a generated map. """
+
+    class SyntheticLevel(levels.Level):
+
+        def __init__(self, player, bad_guys):
+            levels.Level.__init__(self, player, bad_guys)
+            self.background = assets.get("img/background_01.png")
+            self.background.set_colorkey(constants.WHITE)
+            # Never go to the next level
+            self.level_limit = -sys.maxsize
+
+            self.generate_tiles(txt)
+            width = max(len(line) for line in txt.split("\n"))
+            height = len(txt.split("\n"))
+            self.wallpaper_points += [[1, 1], [width - 1, 1], [width - 1, height - 1], [1, height - 1]]
+            self.translate_wallpaper()
+            self.wallpaper_color = (189, 140, 191)
+
+    return SyntheticLevel
+
+
+def guard_factory(count, width, seed=0):
+    """ Returns a bad_guys_factory for Game that spreads count guards
+        over the floors of a map width tiles wide. """
+
+    def create_guards(player):
+        rnd = random.Random(seed)
+        guards = []
+        for i in range(count):
+            image = "img/husband.png" if i == 0 else "img/husband2.png"
+            guard = Husband("guard %d" % i, [0, rnd.randint(2, 6) * 70], image)
+            floor = rnd.randrange(FLOORS)
+            guard.rect.x = rnd.randrange(1, width - 1) * 70
+            guard.rect.y = (2 + 2 * floor) * 70 + 16
+            guard.player = player
+            guards.append(guard)
+        return guards
+
+    return create_guards
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+def run_scenario(screen, sections, guards, ticks, warmup=WARMUP_TICKS):
+    """ Run one scenario, returns its metrics. Times are in ms. """
+    txt = generate_map(sections)
+    width = sections * SECTION_WIDTH
+    game = Game([synthetic_level(txt)], guard_factory(guards, width))
+    renderer = FullRenderer()
+    player = game.player
+    player.go_right()
+
+    update_times = []
+    draw_times = []
+    growth = 0
+
+    gc.collect()
+    gc.disable()
+    try:
+        for tick in range(1, warmup + ticks + 1):
+            if tick % TOUR_INTERVAL == 0:
+                player.rect.x += 10 * 70
+
+            before = gc.get_count()[0]
+            start = default_timer()
+            # The clock has to move for anything that waits for a time
+            sim_clock.tick()
+            game.step()
+            middle = default_timer()
+            game.draw(screen, renderer, alpha=1)
+            end = default_timer()
+            if tick > warmup:
+                growth += gc.get_count()[0] - before
+                update_times.append((middle - start) * 1000)
+                draw_times.append((end - middle) * 1000)
+    finally:
+        gc.enable()
+
+    return {
+        "update_p50": percentile(update_times, 50),
+        "update_p99": percentile(update_times, 99),
+        "draw_p50": percentile(draw_times, 50),
+        "draw_p99": percentile(draw_times, 99),
+        "gc_growth_per_tick": float(growth) / ticks,
+    }
+
+
+def compare(results, baseline, tolerance, slack=0.05, compared=COMPARED):
+    """ Names of the compared metrics that got worse than the baseline by
+        more than tolerance, a fraction, plus slack, an absolute amount. """
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        for metric in compared:
+            value = metrics[metric]
+            expected = baseline.get(name, {}).get(metric)
+            if expected is not None and value > expected * (1 + tolerance) + slack:
+                regressions.append("%s %s: %.3f, baseline %.3f" % (name, metric, value, expected))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark update and draw on synthetic levels.")
+    parser.add_argument("--ticks", type=int, default=600, help="ticks measured per scenario")
+    parser.add_argument("--warmup", type=int, default=WARMUP_TICKS, help="ticks run before measuring")
+    parser.add_argument("--scenario", action="append", help="run only this scenario, can be repeated")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%")
+    args = parser.parse_args(argv)
+
+    screen = headless.init_display()
+
+    results = {}
+    print("%-10s %10s %10s %10s %10s %12s" % ("scenario", "update p50", "update p99", "draw p50", "draw p99", "gc growth"))
+    for name, sections, guards in SCENARIOS:
+        if args.scenario and name not in args.scenario:
+            continue
+        metrics = run_scenario(screen, sections, guards, args.ticks, args.warmup)
+        results[name] = metrics
+        print("%-10s %10.3f %10.3f %10.3f %10.3f %12.1f" % (
+            name, metrics["update_p50"], metrics["update_p99"],
+            metrics["draw_p50"], metrics["draw_p99"], metrics["gc_growth_per_tick"]))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print("baseline saved to %s" % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline at %s, run with --save-baseline" % args.baseline)
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    for note in compare(results, baseline, args.tolerance, compared=NOTED):
+        print("note, slower than the baseline " + note)
+    if not regressions:
+        print("no regressions against %s" % args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
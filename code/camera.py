@@ -0,0 +1,107 @@
+"""
+Camera that turns world coordinates into screen coordinates.
+
+Every sprite keeps its rect in world coordinates. Scrolling only moves
+the camera; sprites are offset when they are drawn.
+
+When the simulation runs in fixed steps the frame usually falls between
+two steps. Setting alpha makes the camera draw the camera itself and
+every sprite that remembers its previous_position at the interpolated
+position between the last two steps.
+"""
+import pygame
+
+import constants
+
+# Moves longer than this between two steps, like going up the stairs,
+# are drawn as a jump instead of being interpolated
+MAX_INTERPOLATED_MOVE = 70
+
+
+def _lerp(previous, current, alpha):
+    if abs(current - previous) >= MAX_INTERPOLATED_MOVE:
+        return current
+    return int(round(previous + (current - previous) * alpha))
+
+
+class Camera(object):
+    """ Horizontal viewport over the level. """
+
+    def __init__(self, width=constants.SCREEN_WIDTH, height=constants.SCREEN_HEIGHT):
+        # World x coordinate of the left edge of the screen
+        self.x = 0
+        self.previous_x = 0
+        self.width = width
+        self.height = height
+        # Interpolation between the previous step and this one, 1 draws
+        # everything where the simulation has it
+        self.alpha = 1.0
+
+    def begin_step(self):
+        """ Called before each simulation step. """
+        self.previous_x = self.x
+
+    def scroll(self, shift_x):
+        """ Scroll the view. A negative shift moves the world to the left,
+            the same as Level.shift_world. """
+        self.x -= shift_x
+
+    @property
+    def view_x(self):
+        """ World x coordinate of the left edge of the screen as drawn. """
+        if self.alpha >= 1:
+            return self.x
+        return _lerp(self.previous_x, self.x, self.alpha)
+
+    def to_screen_x(self, x):
+        """ Screen x coordinate of a world x coordinate. """
+        return x - self.x
+
+    def to_world_x(self, x):
+        """ World x coordinate of a screen x coordinate. """
+        return x + self.x
+
+    def apply(self, rect):
+        """ Return a copy of a world rect moved into screen space. """
+        return rect.move(-self.view_x, 0)
+
+    def screen_rect(self, sprite):
+        """ Where the sprite is drawn on screen this frame. """
+        rect = sprite.rect
+        previous = getattr(sprite, "previous_position", None)
+        if self.alpha >= 1 or previous is None:
+            return rect.move(-self.view_x, 0)
+        x = _lerp(previous[0], rect.x, self.alpha)
+        y = _lerp(previous[1], rect.y, self.alpha)
+        return pygame.Rect(x - self.view_x, y, rect.width, rect.height)
+
+    @property
+    def viewport(self):
+        """ The part of the world that is on screen. """
+        return pygame.Rect(self.view_x, 0, self.width, self.height)
+
+    def visible(self, group):
+        """ The sprites of the group that may be on screen this frame, in
+            the order they are drawn. Only looks near the screen in groups
+            that can, see culling.py. """
+        near = getattr(group, "near", None)
+        if near is None:
+            return group
+        # Sprites are drawn up to a step away from where they are
+        left = self.view_x - MAX_INTERPOLATED_MOVE
+        return near(left, left + self.width + 2 * MAX_INTERPOLATED_MOVE)
+
+    def draw(self, screen, group):
+        """ Draw a sprite group whose rects are in world coordinates, with
+            one blits call where pygame has it. """
+        sprites = self.visible(group)
+        if self.alpha >= 1:
+            x = self.x
+            batch = [(sprite.image, (sprite.rect.x - x, sprite.rect.y)) for sprite in sprites]
+        else:
+            batch = [(sprite.image, self.screen_rect(sprite)) for sprite in sprites]
+        if hasattr(screen, "blits"):
+            screen.blits(batch, False)
+        else:
+            for image, position in batch:
+                screen.blit(image, position)
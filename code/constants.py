@@ -15,3 +15,38 @@ SCREEN_HEIGHT = 600
 GAME_OVER_EVENT = "gameover"
 LEVEL_COMPLETE_EVENT = "lvlcomplete"
 MESSAGE = "msg"
+# Noises in the world, see audio.py
+JUMP_EVENT = "jump"
+DOOR_EVENT = "door"
+WARDROBE_EVENT = "wardrobe"
+CHANDELIER_EVENT = "chandelier"
+
+# Audio
+# Background track, streamed while the game runs; None plays no music
+MUSIC = "resources/DST-Arch-Delerium.ogg"
+
+# Rendering
+# Redraw only the parts of the screen that changed, see renderer.py
+DIRTY_RENDERING = False
+
+# Guards
+# Levels with at least this many husbands update them with the NumPy
+# engine in guards.py, when NumPy is installed
+VECTOR_GUARDS_MIN = 32
+# Husbands that see the player chase him over the navigation graph of
+# the level, see navigation.py
+GUARDS_CHASE = False
+# Husbands far from the screen are updated less often, see lod.py
+GUARDS_LOD = True
+
+# Levels
+# Only things near the camera exist as sprites, see streaming.py
+STREAMING = True
+# Seconds of play Backspace can take back, see snapshot.py; 0 turns it off
+REWIND_SECONDS = 10
+# Seconds between two snapshots kept for it
+REWIND_EVERY = 0.5
+
+# Profiling
+# Time the phases of every frame and show them on screen, see profiler.py
+PROFILING = False
@@ -0,0 +1,75 @@
+"""
+Sprite group that only hands out the sprites near the screen.
+
+Sprites are kept in buckets by the x of their rect, so the ones that
+may be on screen are found by looking at the few buckets the screen
+covers, however long the level is. Sprites that move have to be passed
+to moved() after they did, or they are looked for where they were.
+"""
+import pygame
+
+# Width of a bucket in pixels, sprites wider than this are always looked at
+BUCKET_WIDTH = 256
+
+
+class CullingGroup(pygame.sprite.OrderedUpdates):
+
+    def __init__(self, *sprites):
+        # bucket -> sprites whose rect starts in it
+        self._buckets = {}
+        # sprite -> (bucket, order it was added in)
+        self._placed = {}
+        self._wide = []
+        self._added = 0
+        pygame.sprite.OrderedUpdates.__init__(self, *sprites)
+
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.OrderedUpdates.add_internal(self, sprite)
+        self._added += 1
+        self._place(sprite, self._added)
+
+    def remove_internal(self, sprite):
+        pygame.sprite.OrderedUpdates.remove_internal(self, sprite)
+        self._unplace(sprite)
+
+    def _place(self, sprite, order):
+        if sprite.rect.width > BUCKET_WIDTH:
+            bucket = None
+            self._wide.append(sprite)
+        else:
+            bucket = sprite.rect.x // BUCKET_WIDTH
+            self._buckets.setdefault(bucket, []).append(sprite)
+        self._placed[sprite] = (bucket, order)
+
+    def _unplace(self, sprite):
+        bucket, order = self._placed.pop(sprite)
+        if bucket is None:
+            self._wide.remove(sprite)
+        else:
+            sprites = self._buckets[bucket]
+            sprites.remove(sprite)
+            if not sprites:
+                del self._buckets[bucket]
+        return order
+
+    def moved(self, sprites):
+        """ Put the sprites that moved into the right buckets. """
+        placed = self._placed
+        for sprite in sprites:
+            entry = placed.get(sprite)
+            if entry is not None and entry[0] is not None and entry[0] != sprite.rect.x // BUCKET_WIDTH:
+                self._place(sprite, self._unplace(sprite))
+
+    def near(self, left, right):
+        """ Sprites whose rect starts between left - BUCKET_WIDTH and
+            right, and the wide ones, in the order they were added. """
+        found = list(self._wide)
+        buckets = self._buckets
+        for bucket in range(left // BUCKET_WIDTH - 1, right // BUCKET_WIDTH + 1):
+            sprites = buckets.get(bucket)
+            if sprites:
+                found.extend(sprites)
+        if len(found) > 1:
+            placed = self._placed
+            found.sort(key=lambda sprite: placed[sprite][1])
+        return found
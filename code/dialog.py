@@ -1,4 +1,4 @@
-import pygame
+from fonts import fonts
 
 
 class Dialog:
@@ -11,10 +11,11 @@ class Dialog:
         self.x = x
         self.y = y
         self.message = message
-        self.bubble = pygame.Rect(x, y, 32 * len(message) + 16, 44)
+        # The bubble and its text are rendered once and reused every
+        # frame, see fonts.bubble
+        self._surface = fonts.bubble(message)
+        self.bubble = self._surface.get_rect(topleft=(x, y))
 
     def draw(self, surface):
-        pygame.draw.rect(surface, (255, 255, 255), self.bubble, 0)
-        font = pygame.font.Font('resources/PressStart2P.ttf', 32)
-        angle_display = font.render(self.message, 0, (0, 0, 0))
-        surface.blit(angle_display, (self.x+8, self.y+8))
\ No newline at end of file
+        """ A single blit. Returns the rect it covers. """
+        return surface.blit(self._surface, self.bubble)
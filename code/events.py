@@ -0,0 +1,122 @@
+"""
+In-process event bus for game events.
+
+Events are published to a topic and delivered to the topic's subscribers
+once per simulation step, when the game calls dispatch(). Every topic
+takes one event type. A coalescing topic keeps only the last event
+published during a step, so a hundred guards shouting the same thing
+cost one delivery. A topic with a window also drops an event equal to
+the one it delivered less than window ticks ago.
+
+Nothing goes through the SDL queue, which is left to input.
+"""
+from collections import namedtuple
+
+import constants
+from timing import sim_clock
+
+# A line to show in a speech bubble for time seconds
+Message = namedtuple("Message", "text time")
+# Something that makes a sound at a point in the world
+Noise = namedtuple("Noise", "x y")
+
+
+class Topic(object):
+
+    def __init__(self, name, event_type, coalesce=True, window=0):
+        self.name = name
+        self.event_type = event_type
+        self.coalesce = coalesce
+        self.window = window
+        self.subscribers = []
+        # Last event delivered and the tick it was delivered at
+        self.last_event = None
+        self.last_tick = None
+
+
+class EventBus(object):
+    """ Topics, their subscribers and the events waiting for the next
+        dispatch. """
+
+    def __init__(self):
+        self.topics = {}
+        # key -> (topic, event) and the order the keys were published in
+        self._pending = {}
+        self._order = []
+        self._sequence = 0
+
+    def register(self, name, event_type, coalesce=True, window=0):
+        self.topics[name] = Topic(name, event_type, coalesce, window)
+
+    def subscribe(self, name, handler):
+        """ Call handler with every event delivered on the topic. """
+        self.topics[name].subscribers.append(handler)
+
+    def publish(self, name, event):
+        topic = self.topics[name]
+        if not isinstance(event, topic.event_type):
+            raise TypeError("%s takes %s events, not %r" % (name, topic.event_type.__name__, event))
+
+        if topic.window and event == topic.last_event and sim_clock.ticks - topic.last_tick < topic.window:
+            return
+
+        if topic.coalesce:
+            # The newest event replaces the waiting one and moves to the
+            # end, so events are still delivered in the order they happened
+            key = name
+            if key in self._pending:
+                self._order.remove(key)
+        else:
+            key = (name, self._sequence)
+            self._sequence += 1
+        self._pending[key] = (topic, event)
+        self._order.append(key)
+
+    def dispatch(self):
+        """ Deliver the events published since the last dispatch. Events
+            published by the handlers wait for the next one. """
+        if not self._order:
+            return
+        pending, order = self._pending, self._order
+        self._pending, self._order = {}, []
+        for key in order:
+            topic, event = pending[key]
+            topic.last_event = event
+            topic.last_tick = sim_clock.ticks
+            for handler in topic.subscribers:
+                handler(event)
+
+    def history(self):
+        """ The last event every topic delivered and when, as plain
+            values. """
+        return tuple((name, tuple(topic.last_event) if topic.last_event is not None else None, topic.last_tick)
+                     for name, topic in sorted(self.topics.items()))
+
+    def restore_history(self, history):
+        """ Go back to an earlier history(). Waiting events are dropped,
+            subscribers are kept. """
+        self._pending, self._order = {}, []
+        for name, last_event, last_tick in history:
+            topic = self.topics[name]
+            topic.last_event = topic.event_type(*last_event) if last_event is not None else None
+            topic.last_tick = last_tick
+
+    def reset(self):
+        """ Drop the subscribers and waiting events, for a new game. """
+        self._pending, self._order = {}, []
+        for topic in self.topics.values():
+            topic.subscribers = []
+            topic.last_event = None
+            topic.last_tick = None
+
+
+# The bus shared by the whole game
+bus = EventBus()
+bus.register(constants.MESSAGE, Message)
+# The game is over after the first one, repeats only keep the message up
+bus.register(constants.GAME_OVER_EVENT, Message, window=60)
+bus.register(constants.LEVEL_COMPLETE_EVENT, Message, window=60)
+bus.register(constants.JUMP_EVENT, Noise)
+bus.register(constants.DOOR_EVENT, Noise)
+bus.register(constants.WARDROBE_EVENT, Noise)
+bus.register(constants.CHANDELIER_EVENT, Noise)
@@ -0,0 +1,77 @@
+"""
+Cached text rendering. Font files are opened once, and rendered text
+surfaces are kept in a small LRU cache so a message that stays on
+screen is rendered only once.
+"""
+from collections import OrderedDict
+
+import pygame
+
+import constants
+
+DIALOG_FONT = 'resources/PressStart2P.ttf'
+DIALOG_FONT_SIZE = 32
+HELP_FONT = 'resources/FreeMono.ttf'
+HELP_FONT_SIZE = 18
+
+# Padding between the speech bubble edge and its text
+BUBBLE_PADDING = 8
+BUBBLE_HEIGHT = 44
+
+
+class TextRenderer(object):
+    """ Hands out cached font handles and rendered text surfaces. """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self._fonts = {}
+        # render key -> surface, least recently used first
+        self._surfaces = OrderedDict()
+
+    def font(self, file_name, size):
+        """ Return the font for the file and size, opening it only once. """
+        key = (file_name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(file_name, size)
+            self._fonts[key] = font
+        return font
+
+    def _cached(self, key):
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            del self._surfaces[key]
+            self._surfaces[key] = surface
+        return surface
+
+    def _store(self, key, surface):
+        self._surfaces[key] = surface
+        while len(self._surfaces) > self.capacity:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def render(self, message, color, file_name=HELP_FONT, size=HELP_FONT_SIZE):
+        """ Return a surface with the message rendered in the given font. """
+        key = ("text", message, color, file_name, size)
+        surface = self._cached(key)
+        if surface is None:
+            surface = self._store(key, self.font(file_name, size).render(message, 0, color))
+        return surface
+
+    def bubble(self, message):
+        """ Return a pre-baked speech bubble: black dialog text on a
+            white box sized for the message. """
+        key = ("bubble", message)
+        surface = self._cached(key)
+        if surface is None:
+            width = DIALOG_FONT_SIZE * len(message) + 2 * BUBBLE_PADDING
+            surface = pygame.Surface([width, BUBBLE_HEIGHT]).convert()
+            surface.fill(constants.WHITE)
+            label = self.render(message, constants.BLACK, DIALOG_FONT, DIALOG_FONT_SIZE)
+            surface.blit(label, (BUBBLE_PADDING, BUBBLE_PADDING))
+            self._store(key, surface)
+        return surface
+
+
+# The renderer shared by the whole game
+fonts = TextRenderer()
@@ -0,0 +1,273 @@
+"""
+The game world and the logic of a single simulation step, shared by the
+windowed main loop in platform_scroller and the headless runner.
+"""
+import pygame
+
+import constants
+import dialog
+from events import bus
+import levels
+from fonts import fonts
+from husband import Husband
+from player import Player
+from profiler import profiler
+from scheduler import scheduler
+import snapshot
+from timing import sim_clock
+
+# Left and right edges of the area the player can walk in before the
+# world starts to scroll
+SCROLL_LEFT = 120
+SCROLL_RIGHT = 500
+
+
+def show_help(screen):
+    textcolor = (255, 255, 255)
+    help_text = ["Help", "Move around    arrow keys", "Use sword  space"]
+    for i, line in enumerate(help_text):
+        angle_display = fonts.render(line, textcolor)
+        screen.blit(angle_display, (0, 18 * i))
+
+
+def print_msg(message, x, y, screen):
+    txt = dialog.Dialog(x, y, message)
+    return txt.draw(screen)
+
+
+def draw_overlay(screen, level, messages):
+    """ Draw the HUD and the messages, returns the rects they cover. """
+    rects = level.draw_hud(screen)
+    #show_help(screen)
+    for message in messages:
+        rects.append(print_msg(message, 10, 510, screen))
+    if profiler.show_overlay:
+        rects.append(profiler.draw_overlay(screen))
+    return rects
+
+
+def create_bad_guys(player):
+    bad_guys = []
+
+    # Add husband
+    husband = Husband("husband", [0, 420])
+    husband.rect.x = 2310
+    husband.rect.y = constants.SCREEN_HEIGHT - husband.rect.height - 100
+    husband.player = player
+    bad_guys.append(husband)
+
+    # Add guard
+    guard = Husband("guard 0", [0, 420], "img/husband2.png")
+    guard.rect.x = 2310
+    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 380
+    guard.player = player
+    bad_guys.append(guard)
+
+    # Add guard
+    guard = Husband("guard 1", [0, 420], "img/husband2.png")
+    guard.rect.x = 1100
+    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 380
+    guard.player = player
+    bad_guys.append(guard)
+
+    # Add guard
+    guard = Husband("guard 2", [0, 350], "img/husband2.png")
+    guard.rect.x = 970
+    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 240
+    guard.player = player
+    bad_guys.append(guard)
+
+    # Add guard
+    guard = Husband("guard 3", [0, 140], "img/husband2.png")
+    guard.rect.x = 1010
+    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 100
+    guard.player = player
+    bad_guys.append(guard)
+
+    return bad_guys
+
+
+class Game(object):
+    """ Everything that changes while the game is played. Needs the
+        display to be set up, because sprites convert their images. """
+
+    def __init__(self, level_classes=(levels.Level01,), bad_guys_factory=create_bad_guys):
+        """ bad_guys_factory is called with the player and returns the
+            husbands to put in the levels. """
+        # Every game starts from scratch
+        sim_clock.reset()
+        bus.reset()
+        scheduler.reset(sim_clock.ticks)
+        Husband.reset_suspicion()
+
+        # Create the player
+        self.player = Player()
+        self.bad_guys = bad_guys_factory(self.player)
+
+        # Create all the levels
+        self.level_list = [level_class(self.player, self.bad_guys) for level_class in level_classes]
+
+        # Set the current level
+        self.current_level_no = 0
+        self.current_level = self.level_list[self.current_level_no]
+
+        self.active_sprite_list = pygame.sprite.OrderedUpdates()
+        self.player.level = self.current_level
+        self.player.sprite_list = self.active_sprite_list
+        self.player.rect.x = 340
+        self.player.rect.y = constants.SCREEN_HEIGHT - self.player.rect.height - 30
+        self.active_sprite_list.add(self.player)
+
+        self.current_message = "Oh no! It's my husband!"
+        self.message_expire = None
+        self.message_display_time = 2
+        # Messages on screen right now
+        self.messages = []
+
+        self.time_start = sim_clock.time
+        self.dead = False
+        # Set when the player asks to quit
+        self.done = False
+        # Gets every key handled, see replay.Recorder
+        self.recorder = None
+
+        bus.subscribe(constants.MESSAGE, self.show_message)
+        bus.subscribe(constants.GAME_OVER_EVENT, self.end_game)
+        bus.subscribe(constants.LEVEL_COMPLETE_EVENT, self.end_game)
+
+        # Where R goes back to after dying, the start of the level
+        self.checkpoint = snapshot.take(self)
+        # Where Backspace goes back to, see snapshot.Rewind
+        self.rewind = None
+
+    def handle_event(self, event):
+        """ React to one pygame event. """
+        if event.type == pygame.QUIT:  # If user clicked close
+            self.done = True  # Flag that we are done so we exit this loop
+        if event.type == pygame.KEYDOWN:
+            self.handle_key(event.key, True)
+        if event.type == pygame.KEYUP:
+            self.handle_key(event.key, False)
+
+    def show_message(self, message):
+        self.current_message = message.text
+        self.message_display_time = message.time
+
+    def end_game(self, message):
+        self.show_message(message)
+        self.dead = True
+
+    def handle_key(self, key, down):
+        """ React to a key being pressed or released. Keys take effect in
+            the next simulation step. """
+        if self.recorder:
+            self.recorder.record(sim_clock.ticks + 1, key, down)
+
+        player = self.player
+        if down:
+            if key == pygame.K_ESCAPE:
+                self.done = True
+            if key == pygame.K_F3:
+                profiler.toggle_overlay()
+            if key == pygame.K_BACKSPACE and self.rewind:
+                self.rewind.back(self)
+            if key == pygame.K_r and self.dead:
+                snapshot.restore(self, self.checkpoint)
+            if not self.dead:
+                if key == pygame.K_LEFT:
+                    player.go_left()
+                if key == pygame.K_RIGHT:
+                    player.go_right()
+                if key == pygame.K_UP:
+                    player.jump()
+                if key == pygame.K_SPACE:
+                    player.disable_movement()
+        else:
+            if key == pygame.K_LEFT and player.change_x < 0:
+                player.stop()
+            if key == pygame.K_RIGHT and player.change_x > 0:
+                player.stop()
+            if key == pygame.K_SPACE:
+                player.enable_movement()
+
+    def step(self):
+        """ Advance the world by one step of the simulation clock. """
+        player = self.player
+        current_level = self.current_level
+        current_level.begin_step()
+
+        # Update the player.
+        with profiler.phase("active_sprite_list.update"):
+            self.active_sprite_list.update()
+
+        # Update items in the level
+        with profiler.phase("Level.update"):
+            current_level.update()
+
+        # Things waiting for a time to come
+        with profiler.phase("timers"):
+            scheduler.run(sim_clock.ticks)
+
+        # The player keeps world coordinates, this is where he is on screen
+        camera = current_level.camera
+        screen_x = camera.to_screen_x(player.rect.x)
+
+        with profiler.phase("shift_world"):
+            # If the player gets near the right side, shift the world left (-x)
+            if screen_x >= SCROLL_RIGHT:
+                diff = screen_x - SCROLL_RIGHT
+                screen_x = SCROLL_RIGHT
+                current_level.shift_world(-diff)
+
+            # If the player gets near the left side, shift the world right (+x)
+            if screen_x <= SCROLL_LEFT:
+                diff = SCROLL_LEFT - screen_x
+                screen_x = SCROLL_LEFT
+                current_level.shift_world(diff)
+
+        # If the player gets to the end of the level, go to the next level
+        current_position = screen_x + current_level.world_shift
+        if current_position < current_level.level_limit:
+            player.rect.x = camera.to_world_x(SCROLL_LEFT)
+            if self.current_level_no < len(self.level_list) - 1:
+                self.current_level_no += 1
+                self.current_level = self.level_list[self.current_level_no]
+                player.level = self.current_level
+                self.checkpoint = None
+
+        # Events published during this step are handled right away, so
+        # they take effect at the same step however frames are drawn
+        bus.dispatch()
+
+        self.update_messages()
+
+        if self.checkpoint is None:
+            self.checkpoint = snapshot.take(self)
+        if self.rewind:
+            self.rewind.record(self)
+
+    def update_messages(self):
+        """ Work out which messages are on screen. """
+        now = sim_clock.time
+        self.messages = []
+        if now - self.time_start < 4 and now - self.time_start > 2:
+            self.messages.append("WHAT DO WE DO NOW?!?")
+
+        if self.current_message:
+            self.messages.append(self.current_message)
+            if not self.message_expire:
+                self.message_expire = now
+        if self.message_expire and now - self.message_expire > self.message_display_time:
+            self.current_message = None
+            self.message_expire = None
+
+    def draw(self, screen, renderer, alpha=None):
+        """ Draw the world. By default it is drawn between the last two
+            steps, as far as the simulation clock has got; alpha=1 draws
+            it as of the last step. """
+        level = self.current_level
+        if alpha is None:
+            alpha = sim_clock.alpha
+        level.camera.alpha = alpha
+        renderer.draw(screen, level, self.active_sprite_list,
+                      lambda surface: draw_overlay(surface, level, self.messages))
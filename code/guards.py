@@ -0,0 +1,172 @@
+"""
+Structure-of-arrays engine for patrolling husbands.
+
+Instead of every Husband sprite running its own _ai and
+_update_animation, the engine keeps the position, direction, patrol
+bounds and animation counter of all husbands of a level in NumPy arrays
+and advances them together: patrol turnaround, the sight volume and the
+test against the player are a handful of array operations per step,
+whatever the number of husbands.
+
+The arrays are the real state. Every step the rects are written back,
+because doors and stairs collide with husbands anywhere in the level,
+but images and sight rects only for the husbands near the screen;
+sync_all() writes back everything. The result is step for step the
+same as updating the sprites one by one.
+
+NumPy is optional. Without it available() is False and levels keep
+updating the sprites.
+"""
+import constants
+from events import bus
+from husband import Husband, SightVolumes, SEEN, CAUGHT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Husbands this far left or right of the screen get their image written
+# back too, which has to be more than any patrol is wide
+SYNC_MARGIN = constants.SCREEN_WIDTH
+
+
+def available():
+    return numpy is not None
+
+
+class GuardEngine(object):
+    """ All husbands of one group, updated at once. """
+
+    def __init__(self):
+        self.husbands = []
+        # Sprites in the group the engine doesn't handle, husbands
+        # that find their own way among them
+        self.others = []
+        self.other_sight = SightVolumes()
+        self._group_size = None
+
+    def load(self, group):
+        """ Take over the husbands in the group, starting from the state
+            of their sprites. """
+        self.husbands = [sprite for sprite in group if isinstance(sprite, Husband) and sprite.nav is None]
+        handled = set(self.husbands)
+        self.others = [sprite for sprite in group if sprite not in handled]
+        self.other_sight = SightVolumes()
+        self.other_sight.sync(self.others)
+        self._group_size = len(group)
+
+        husbands = self.husbands
+        self.x = numpy.array([h.rect.x for h in husbands], dtype=numpy.int64)
+        self.y = numpy.array([h.rect.y for h in husbands], dtype=numpy.int64)
+        self.width = numpy.array([h.rect.width for h in husbands], dtype=numpy.int64)
+        self.height = numpy.array([h.rect.height for h in husbands], dtype=numpy.int64)
+        self.x0 = numpy.array([h._x0 for h in husbands], dtype=numpy.int64)
+        self.change_x = numpy.array([h._change_x for h in husbands], dtype=numpy.int64)
+        self.facing_right = numpy.array([h._direction == "R" for h in husbands], dtype=bool)
+        self.frequency = numpy.array([h._sprite_frame_frequency for h in husbands], dtype=numpy.int64)
+        self.zone_left = numpy.array([h._patrol_zone[0] for h in husbands], dtype=numpy.int64)
+        self.zone_right = numpy.array([h._patrol_zone[1] for h in husbands], dtype=numpy.int64)
+        self.sight_width = numpy.array([h.sight_width for h in husbands], dtype=numpy.int64)
+        self.sight_height = numpy.array([h.sight_height for h in husbands], dtype=numpy.int64)
+        self.frame_count = numpy.array([len(h._walking_frames_r) for h in husbands], dtype=numpy.int64)
+        self.sight_x = self.x.copy()
+        self.sight_y = self.y.copy()
+        self.frame = numpy.zeros(len(husbands), dtype=numpy.int64)
+
+    def update(self, group, viewport):
+        """ One step for every sprite in the group. viewport is the part
+            of the world on screen. """
+        if len(group) != self._group_size:
+            # Husbands were killed or added, start again from the sprites
+            self.sync_all()
+            self.load(group)
+
+        for sprite in self.others:
+            sprite.update()
+        if not self.husbands:
+            return
+
+        # Husband._update_position, all husbands walk faster as suspicion grows
+        k = Husband.speed()
+        step = k * self.change_x
+        self.x0 += step
+        self.x += step
+
+        # Husband._ai, turn around at the ends of the patrol zone
+        turn_left = self.x0 > self.zone_right
+        turn_right = ~turn_left & (self.x0 < self.zone_left)
+        self.change_x[turn_left] = -1
+        self.facing_right[turn_left] = False
+        self.change_x[turn_right] = 1
+        self.facing_right[turn_right] = True
+
+        # Husband._update_sight
+        self.sight_x = numpy.where(self.facing_right, self.x + self.sight_width, self.x - self.sight_width)
+        self.sight_y = self.y
+
+        # Husband._update_animation
+        self.frequency += 4
+        self.frame = (self.frequency // 30) % self.frame_count
+
+        # Doors and stairs anywhere in the level collide with husbands,
+        # so every rect is written back. Images only matter on screen.
+        x = self.x.tolist()
+        for husband, husband_x in zip(self.husbands, x):
+            husband.rect.x = husband_x
+        near = (self.x + self.width > viewport.left - SYNC_MARGIN) & (self.x < viewport.right + SYNC_MARGIN)
+        self._sync(numpy.flatnonzero(near).tolist())
+
+    def _sync(self, indexes, full=False):
+        """ Write the arrays back to the sprites at the given indexes. """
+        husbands = self.husbands
+        x = self.x.tolist()
+        sight_x = self.sight_x.tolist()
+        frame = self.frame.tolist()
+        facing_right = self.facing_right.tolist()
+        for i in indexes:
+            husband = husbands[i]
+            husband.rect.x = x[i]
+            husband.sight_rect.x = sight_x[i]
+            husband.sight_rect.y = husband.rect.y
+            if facing_right[i]:
+                husband.image = husband._walking_frames_r[frame[i]]
+            else:
+                husband.image = husband._walking_frames_l[frame[i]]
+        if full:
+            x0 = self.x0.tolist()
+            change_x = self.change_x.tolist()
+            frequency = self.frequency.tolist()
+            for i in indexes:
+                husband = husbands[i]
+                husband._x0 = x0[i]
+                husband._change_x = change_x[i]
+                husband._direction = "R" if facing_right[i] else "L"
+                husband._sprite_frame_frequency = frequency[i]
+
+    def sync_all(self):
+        """ Write the whole state back to every husband sprite. """
+        if self.husbands:
+            self._sync(range(len(self.husbands)), full=True)
+
+    def check(self, player, occlusion=None):
+        """ SightVolumes.check for all husbands in the group. """
+        self.other_sight.check(player, occlusion)
+        if player.hidden or not self.husbands:
+            return
+        left, top, right, bottom = player.rect.left, player.rect.top, player.rect.right, player.rect.bottom
+
+        seen = ((self.sight_x < right) & (left < self.sight_x + self.sight_width) &
+                (self.sight_y < bottom) & (top < self.sight_y + self.sight_height))
+        for i in numpy.flatnonzero(seen).tolist():
+            if not self.husbands[i].can_see(player, occlusion):
+                continue
+            Husband._increase_suspicion_meter(10)
+            if Husband._suspicion_value < 100:
+                bus.publish(constants.MESSAGE, SEEN)
+
+        caught = ((self.x < right) & (left < self.x + self.width) &
+                  (self.y < bottom) & (top < self.y + self.height))
+        for i in range(numpy.count_nonzero(caught)):
+            Husband._increase_suspicion_meter(100)
+            bus.publish(constants.GAME_OVER_EVENT, CAUGHT)
@@ -0,0 +1,153 @@
+"""
+Runs the game without a window and without waiting for the clock.
+
+The world is stepped as fast as the CPU allows, with input read from a
+script instead of the keyboard, and is only drawn every Nth step if at
+all. Used for balancing runs and regression checks:
+
+    python headless.py --ticks 3600 --runs 100 --script moves.txt
+
+A script has one key press or release per line, "<tick> <key> <down|up>",
+for example "30 right down". Lines starting with # are ignored.
+Recordings made with --record, here or in the game, can be played back
+with --replay; the run then checks it ends in the recorded state.
+"""
+import argparse
+import os
+import time
+
+import pygame
+
+import constants
+from game import Game
+from husband import Husband
+import replay
+from renderer import FullRenderer
+from timing import sim_clock
+
+# Key names that can be used in scripts
+KEYS = {
+    "left": pygame.K_LEFT,
+    "right": pygame.K_RIGHT,
+    "up": pygame.K_UP,
+    "space": pygame.K_SPACE,
+    "escape": pygame.K_ESCAPE,
+}
+
+
+def init_display(window=False):
+    """ Set up just enough of pygame for sprites to load their images.
+        Unless a window is asked for, SDL's dummy video driver is used. """
+    if not window:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.font.init()
+    return pygame.display.set_mode((constants.SCREEN_WIDTH, constants.SCREEN_HEIGHT))
+
+
+def parse_script(lines):
+    """ Turn script lines into a dict of tick -> [(key, down), ...]. """
+    script = {}
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            tick, key, state = line.split()
+            script.setdefault(int(tick), []).append((KEYS[key], state == "down"))
+        except (ValueError, KeyError):
+            raise ValueError("bad script line %d: %r" % (number, line))
+    return script
+
+
+def load_script(file_name):
+    with open(file_name) as script_file:
+        return parse_script(script_file)
+
+
+def run(ticks, script=None, screen=None, render_every=0, game=None, stop_on_death=False):
+    """ Step a game for the given number of ticks as fast as possible.
+
+        script maps a tick to the keys pressed or released just before
+        it. With a screen and render_every > 0 the game is drawn every
+        render_every ticks. Returns a dict summing up how the game went. """
+    if game is None:
+        game = Game()
+    if script is None:
+        script = {}
+    renderer = FullRenderer()
+
+    start = time.time()
+    while sim_clock.ticks < ticks and not game.done:
+        for event in pygame.event.get():
+            game.handle_event(event)
+        for key, down in script.get(sim_clock.ticks + 1, ()):
+            game.handle_key(key, down)
+
+        sim_clock.tick()
+        game.step()
+
+        if screen is not None and render_every and sim_clock.ticks % render_every == 0:
+            game.draw(screen, renderer, alpha=1)
+            pygame.display.flip()
+
+        if stop_on_death and game.dead:
+            break
+    elapsed = time.time() - start
+
+    return {
+        "ticks": sim_clock.ticks,
+        "seconds": elapsed,
+        "ticks_per_second": sim_clock.ticks / elapsed if elapsed else 0,
+        "dead": game.dead,
+        "suspicion": Husband._suspicion_value,
+        "player": tuple(game.player.rect.topleft),
+        "message": game.current_message,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the game headless, faster than real time.")
+    parser.add_argument("--ticks", type=int, default=3600, help="simulation steps per run")
+    parser.add_argument("--runs", type=int, default=1, help="number of playthroughs")
+    parser.add_argument("--script", help="file with the scripted input")
+    parser.add_argument("--render-every", type=int, default=0, metavar="N",
+                        help="draw every Nth step, 0 never draws")
+    parser.add_argument("--window", action="store_true", help="show a real window instead of the dummy driver")
+    parser.add_argument("--stop-on-death", action="store_true", help="end a run when the player is caught")
+    parser.add_argument("--record", metavar="FILE", help="record the input of the last run")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recording instead of a script")
+    args = parser.parse_args(argv)
+
+    screen = init_display(args.window)
+    script = load_script(args.script) if args.script else {}
+    ticks = args.ticks
+    recording = None
+    if args.replay:
+        recording = replay.load(args.replay)
+        script = recording.script
+        ticks = recording.ticks
+
+    start = time.time()
+    total_ticks = 0
+    for i in range(args.runs):
+        game = Game()
+        if args.record:
+            game.recorder = replay.Recorder()
+        result = run(ticks, script, screen, args.render_every, game, args.stop_on_death)
+        total_ticks += result["ticks"]
+        print("run %d: %d ticks in %.2f s (%.0f ticks/s) dead=%s suspicion=%d player=%s" % (
+            i, result["ticks"], result["seconds"], result["ticks_per_second"],
+            result["dead"], result["suspicion"], result["player"]))
+        if recording:
+            print("replay matches recorded state: %s" % recording.matches(game))
+        if args.record:
+            game.recorder.save(args.record, game)
+    elapsed = time.time() - start
+    print("%d runs, %d ticks in %.2f s" % (args.runs, total_ticks, elapsed))
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from pygame.event import Event
 from constants import GAME_OVER_EVENT
 import constants
+from events import bus, Message
 
 __author__ = 'ksakowsk'
 
@@ -8,25 +8,12 @@ import pygame
 import sys
 import time
 
-from spritesheet_functions import SpriteSheet
+from spritesheet_functions import frames
+from timing import sim_clock
 
-class Block(pygame.sprite.Sprite):
-
-    # Constructor. Pass in the color of the block,
-    # and its x and y position
-    def __init__(self, width, height):
-       # Call the parent class (Sprite) constructor
-       pygame.sprite.Sprite.__init__(self)
-
-       # Create an image of the block, and fill it with a color.
-       # This could also be an image loaded from the disk.
-       self.image = pygame.Surface([width, height])
-       color = pygame.Color(255, 0, 0 , 0);
-       self.image.fill(color)
-
-       # Fetch the rectangle object that has the dimensions of the image
-       # Update the position of this object by setting the values of rect.x and rect.y
-       self.rect = self.image.get_rect()
+# What the husbands say, made once and published as often as needed
+SEEN = Message("I see you!!!", 5)
+CAUGHT = Message("GAME OVER", 10)
 
 class Husband(pygame.sprite.Sprite):
     """ This class implements husband. """
@@ -42,10 +29,29 @@ class Husband(pygame.sprite.Sprite):
     _suspicion_meter_velocity = 7
     _last_suspicion_meter_update = 0
 
+    # Husband sight range simulated by rectangle with given size, the
+    # default for husbands that don't get their own
+    SIGHT_WIDTH = 100
+    SIGHT_HEIGHT = 70
+
+    # Position before the last simulation step, for interpolated drawing
+    previous_position = None
+
+    # Seconds a husband keeps after the player once he lost sight of him,
+    # and how fast he walks meanwhile
+    CHASE_TIME = 5
+    CHASE_SPEED = 3
+    # Offset of the husband's top from the tile he stands on, as set by
+    # Staircase.do_action
+    STAIR_OFFSET_Y = 15
+
+    # Navigation graph of the level, husbands without one only patrol
+    nav = None
+
     # Public references
     player = None
 
-    def __init__(self, name, patrol_zone, sprite_img_path = "img/husband.png"):
+    def __init__(self, name, patrol_zone, sprite_img_path = "img/husband.png", sight_width=None, sight_height=None):
         super(Husband, self).__init__()
 
        # Attributes
@@ -56,21 +62,14 @@ class Husband(pygame.sprite.Sprite):
         self._y0 = 0
         self._direction = "L"
         self._sprite_frame_frequency = 4
-        self._walking_frames_l = []
-        self._walking_frames_r = []
         self._patrol_zone = []
         self._enabled = True
         self._patrol_zone = patrol_zone
 
-        sprite_sheet = SpriteSheet(sprite_img_path)
-
-        for i in range(9):
-            image = sprite_sheet.get_image(i * self._PL_WIDTH, 3 * self._PL_HEIGHT, self._PL_WIDTH, self._PL_HEIGHT-self._PL_MARGIN)
-            self._walking_frames_r.append(image)
-
-        for i in range(9):
-            image = sprite_sheet.get_image(i * self._PL_WIDTH, self._PL_HEIGHT, self._PL_WIDTH, self._PL_HEIGHT-self._PL_MARGIN)
-            self._walking_frames_l.append(image)
+        # Frames are shared by all husbands drawn from the same sheet
+        height = self._PL_HEIGHT - self._PL_MARGIN
+        self._walking_frames_r = frames.strip(sprite_img_path, 0, 3 * self._PL_HEIGHT, self._PL_WIDTH, height, 9)
+        self._walking_frames_l = frames.strip(sprite_img_path, 0, self._PL_HEIGHT, self._PL_WIDTH, height, 9)
 
         # Set the image the player starts with
         self.image = self._walking_frames_l[0]
@@ -78,6 +77,18 @@ class Husband(pygame.sprite.Sprite):
         # Set a reference to the image rect.
         self.rect = self.image.get_rect()
 
+        # Sight volume, moved along with the husband every frame. Walls
+        # in between are taken care of by the level's Occlusion.
+        self.sight_width = sight_width or self.SIGHT_WIDTH
+        self.sight_height = sight_height or self.SIGHT_HEIGHT
+        self.sight_rect = pygame.Rect(0, 0, self.sight_width, self.sight_height)
+
+        # While chasing: when to give up, the node the player was last
+        # seen at, and where to go back to afterwards
+        self._chase_until = None
+        self._goal_node = None
+        self._home = None
+
     def draw_suspicion_meter(self, screen):
         red     = (255, 0, 0)
         black   = (0, 0, 0)
@@ -87,17 +98,26 @@ class Husband(pygame.sprite.Sprite):
         height  = 20
 
         # frame
-        pygame.draw.rect(screen, black, (x - 5, y - 5, 99 + 10, height + 10))
+        frame = pygame.draw.rect(screen, black, (x - 5, y - 5, 99 + 10, height + 10))
 
         # suspicion meter
         pygame.draw.rect(screen, red, (x, y, width, height))
 
+        return frame
+
+    @staticmethod
+    def reset_suspicion():
+        """ Forget all suspicion, for a new game. """
+        Husband._suspicion_value = 0
+        Husband._suspicion_delay = 0
+        Husband._last_suspicion_meter_update = 0
+
     @staticmethod
     def _increase_suspicion_meter(value):
         if (Husband._suspicion_delay % Husband._suspicion_meter_velocity == 0):
 
             if ((Husband._suspicion_value + value) >= 100):
-                pygame.event.post(Event(pygame.USEREVENT, {"action": constants.MESSAGE, "message": "GAME OVER", "time": 10, "kill": True}))
+                bus.publish(GAME_OVER_EVENT, CAUGHT)
                 Husband._suspicion_value = 100
             else:
                 Husband._suspicion_value += value
@@ -115,11 +135,14 @@ class Husband(pygame.sprite.Sprite):
 
         Husband._suspicion_delay += 1
 
-    def _update_position(self):
-        k = Husband._suspicion_value // 13
+    @staticmethod
+    def speed():
+        """ Pixels a patrolling husband walks in a step, all husbands walk
+            faster as suspicion grows. """
+        return max(1, Husband._suspicion_value // 13)
 
-        if k == 0:
-            k = 1
+    def _update_position(self):
+        k = Husband.speed()
 
         dx = (k * self._change_x)
         dy = (k * self._change_y)
@@ -134,7 +157,9 @@ class Husband(pygame.sprite.Sprite):
 
     def _update_animation(self):
         self._sprite_frame_frequency += 4
+        self._choose_frame()
 
+    def _choose_frame(self):
         if self._direction == "R":
             frame = (self._sprite_frame_frequency // 30) % len(self._walking_frames_r)
             self.image = self._walking_frames_r[frame]
@@ -142,53 +167,148 @@ class Husband(pygame.sprite.Sprite):
             frame = (self._sprite_frame_frequency // 30) % len(self._walking_frames_l)
             self.image = self._walking_frames_l[frame]
 
+    def _turn(self):
+        """ Turn around at the ends of the patrol zone. """
+        if self._x0 > self._patrol_zone[1]:
+            self._direction = "L"
+            self._set_direction(-1, 0)
+        elif self._x0 < self._patrol_zone[0]:
+            self._direction = "R"
+            self._set_direction(1, 0)
+
+    def patrol_state(self):
+        """ (x, y, x0, y0, change_x, change_y, direction, frame counter),
+            what patrolling changes. """
+        return (self.rect.x, self.rect.y, self._x0, self._y0, self._change_x, self._change_y,
+                self._direction, self._sprite_frame_frequency)
+
+    def patrolled(self, steps, k):
+        """ The patrol_state() the husband would have after patrolling for
+            the given number of steps, without moving him. Walks straight
+            to each end of the zone instead of stepping. k is the speed he
+            walks at. """
+        x, y, x0, y0, change_x, change_y, direction, frequency = self.patrol_state()
+        left, right = self._patrol_zone[0], self._patrol_zone[1]
+        frequency += 4 * steps
+        while steps > 0:
+            # Steps until the husband is past the end he walks to
+            if change_x > 0:
+                n = (right - x0) // k + 1
+            else:
+                n = (x0 - left) // k + 1
+            n = min(max(n, 1), steps)
+            dx = n * k * change_x
+            dy = n * k * change_y
+            x0 += dx
+            y0 += dy
+            x += dx
+            y += dy
+            # Turn around at the ends, as _turn does
+            if x0 > right:
+                direction, change_x, change_y = "L", -1, 0
+            elif x0 < left:
+                direction, change_x, change_y = "R", 1, 0
+            steps -= n
+        return x, y, x0, y0, change_x, change_y, direction, frequency
+
+    def catch_up(self, steps, k):
+        """ Patrol for the given number of steps at once, ending up where
+            _ai would one step at a time, see patrolled(). No frame is
+            chosen, the sight is moved once at the end. For husbands far
+            from the camera, see lod.py. """
+        (self.rect.x, self.rect.y, self._x0, self._y0, self._change_x, self._change_y,
+         self._direction, self._sprite_frame_frequency) = self.patrolled(steps, k)
+        self._update_sight()
+
     def _set_direction(self, x, y):
         self._change_x = x
         self._change_y = y
 
-    def _collision_detection(self):
-
-        if not self.player.hidden:
-            # husband sight range simulated by rectangle with given size
-            width = 100
-            height = 70
-            block = Block(width, height)
-
-            # compute sight rectangle coordinates in order to detect whether player has been seen or not
-            if self._direction == "R":
-                block.rect.x = self.rect.x + width
-                block.rect.y = self.rect.y
-            elif self._direction == "L":
-                block.rect.x = self.rect.x - width
-                block.rect.y = self.rect.y
-
-            # check if player is in the husband sight
-            if pygame.sprite.collide_rect(block, self.player):
-                #print "I see you!!!"
-
-                Husband._increase_suspicion_meter(10)
-                if Husband._suspicion_value < 100:
-                    pygame.event.post(Event(pygame.USEREVENT, {"action": constants.MESSAGE, "message": "I see you!!!", "time": 5}))
-
-            # check if husband caught player
-            if pygame.sprite.collide_rect(self, self.player):
-                #print "I got you!!!"
-
-                Husband._increase_suspicion_meter(100)
+    def _update_sight(self):
+        """ Move the sight rectangle in front of the husband. The player is
+            tested against it by SightVolumes, for all husbands at once. """
+        if self._direction == "R":
+            self.sight_rect.x = self.rect.x + self.sight_width
+            self.sight_rect.y = self.rect.y
+        elif self._direction == "L":
+            self.sight_rect.x = self.rect.x - self.sight_width
+            self.sight_rect.y = self.rect.y
+
+    def can_see(self, player, occlusion):
+        """ True if no wall is between the husband and the player. """
+        return occlusion is None or occlusion.clear(self.rect.centerx, player.rect.centerx, self.rect.centery)
+
+    def spotted(self, player):
+        """ The player is in sight. Husbands with a navigation graph go
+            after him, across floors and stairs if needed. """
+        if self.nav is None:
+            return
+        if self._home is None:
+            self._home = (self.rect.x, self.rect.y, self._direction)
+        self._chase_until = sim_clock.time + self.CHASE_TIME
+
+    def _navigate(self):
+        """ One step along the shortest path to the player, or back home
+            once the chase is over. Returns False when home. """
+        nav = self.nav
+        chasing = sim_clock.time < self._chase_until
+        if chasing:
+            goal_x, goal_y = self.player.rect.center
+            if not self.player.hidden:
+                goal = nav.node_at(goal_x, goal_y)
+                if goal is not None:
+                    self._goal_node = goal
+            goal = self._goal_node
+        else:
+            goal_x, goal_y, direction = self._home
+            goal = nav.node_at(goal_x + self.rect.width // 2, goal_y + self.rect.height // 2)
+
+        here = nav.node_at(self.rect.centerx, self.rect.centery)
+        hop = None
+        if here is not None and goal is not None:
+            hop = nav.next_hop(here, goal)
+        if hop is None:
+            # Nowhere to go, patrol from here on
+            return False
+
+        tile = nav.tile_size
+        if hop == here:
+            if chasing:
+                target_x = goal_x - self.rect.width // 2
+            else:
+                target_x = goal_x
+                if self.rect.x == target_x:
+                    self.rect.y = goal_y
+                    self._direction = direction
+                    return False
+        elif nav.is_stair(here, hop):
+            column, row = nav.cells[hop]
+            self.rect.x = column * tile
+            self.rect.y = row * tile + self.STAIR_OFFSET_Y
+            return True
+        else:
+            target_x = nav.cells[hop][0] * tile + (tile - self.rect.width) // 2
 
-                pygame.event.post(Event(pygame.USEREVENT, {"action": constants.MESSAGE, "message": "GAME OVER", "time": 10, "kill": True}))
+        dx = max(-self.CHASE_SPEED, min(self.CHASE_SPEED, target_x - self.rect.x))
+        self.rect.x += dx
+        if dx > 0:
+            self._direction = "R"
+        elif dx < 0:
+            self._direction = "L"
+        return True
 
     def _ai(self):
-        self._update_position()
+        if self._home is not None:
+            if self._navigate():
+                self._update_sight()
+                return
+            self._home = None
+            self._chase_until = None
+            self._goal_node = None
 
-        if self._x0 > self._patrol_zone[1]:
-            self._direction = "L"
-            self._set_direction(-1, 0)
-        elif self._x0 < self._patrol_zone[0]:
-            self._direction = "R"
-            self._set_direction(1, 0)
-
-        self._collision_detection()
+        self._update_position()
+        self._turn()
+        self._update_sight()
 
         #print str(time.time()) + "\t" + "updating " + "x=" + str(self.rect.x) + " y=" + str(self.rect.y)
 
@@ -199,3 +319,49 @@ class Husband(pygame.sprite.Sprite):
     def enable_movement(self):
         # if True - husband cannot move through stairs and doors
         self._enabled = True
+
+
+class SightVolumes(object):
+    """ Tests the player against the sight and body rects of a group of
+        husbands in one pass. The rect lists are kept between frames and
+        only rebuilt when husbands are added or removed. """
+
+    def __init__(self):
+        self.husbands = []
+        self.sight_rects = []
+        self.body_rects = []
+
+    def sync(self, group):
+        if len(group) != len(self.husbands):
+            self.load(group)
+
+    def load(self, husbands):
+        """ Test the given husbands from now on. """
+        self.husbands = [husband for husband in husbands if isinstance(husband, Husband)]
+        self.sight_rects = [husband.sight_rect for husband in self.husbands]
+        self.body_rects = [husband.rect for husband in self.husbands]
+
+    def check(self, player, occlusion=None):
+        """ occlusion is the level's Occlusion, husbands don't see
+            through walls with one. """
+        if player.hidden:
+            return
+
+        # check if player is in the husband sight
+        for i in player.rect.collidelistall(self.sight_rects):
+            #print "I see you!!!"
+            if not self.husbands[i].can_see(player, occlusion):
+                continue
+            self.husbands[i].spotted(player)
+
+            Husband._increase_suspicion_meter(10)
+            if Husband._suspicion_value < 100:
+                bus.publish(constants.MESSAGE, SEEN)
+
+        # check if husband caught player
+        for i in player.rect.collidelistall(self.body_rects):
+            #print "I got you!!!"
+
+            Husband._increase_suspicion_meter(100)
+
+            bus.publish(GAME_OVER_EVENT, CAUGHT)
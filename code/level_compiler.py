@@ -0,0 +1,133 @@
+"""
+Compiles the ASCII level maps into a compact, indexed form.
+
+The compiled level holds the interactive tiles, the wall tiles merged
+into horizontal runs, the staircase pairs and the chandelier switch
+links, all worked out in one pass over the map. It is cached on disk
+next to this module, keyed by a hash of the map, so loading a level
+that was seen before is a single unmarshal.
+"""
+import hashlib
+import marshal
+import os
+
+# Bump when the compiled format changes so old cache files are ignored
+FORMAT_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "level_cache")
+
+WALL = '#'
+# Characters that leave a tile empty
+EMPTY = ' .'
+
+
+class CompiledLevel(object):
+    """ The intermediate form of a level map. Coordinates are in tiles. """
+
+    def __init__(self, data):
+        # Number of columns and rows in the map
+        self.width = data["width"]
+        self.height = data["height"]
+        # (char, column, row) of every interactive tile, in reading order
+        self.tiles = data["tiles"]
+        # (column, row, length) of every horizontal run of wall tiles
+        self.wall_runs = data["wall_runs"]
+        # Pairs of indexes into tiles of staircases that lead to each other
+        self.stair_pairs = data["stair_pairs"]
+        # Pairs of indexes into tiles of (switch, chandelier)
+        self.chandelier_links = data["chandelier_links"]
+        # One bitmask per row, bit n is set if column n is a wall
+        self.solid_rows = data["solid_rows"]
+
+    def is_solid(self, column, row):
+        if row < 0 or row >= self.height or column < 0:
+            return False
+        return bool(self.solid_rows[row] >> column & 1)
+
+
+def compile_map(txt):
+    """ Turn an ASCII map into the data of a CompiledLevel. """
+    lines = txt.split("\n")
+    tiles = []
+    wall_runs = []
+    solid_rows = []
+    stairs = {}
+    stair_pairs = []
+    switches = []
+    chandeliers = []
+
+    for row, line in enumerate(lines):
+        mask = 0
+        run_start = None
+        for column, char in enumerate(line + " "):
+            if char == WALL:
+                mask |= 1 << column
+                if run_start is None:
+                    run_start = column
+                continue
+            if run_start is not None:
+                wall_runs.append((run_start, row, column - run_start))
+                run_start = None
+            if char in EMPTY:
+                continue
+
+            index = len(tiles)
+            tiles.append((char, column, row))
+            if char.isdigit():
+                if char in stairs:
+                    stair_pairs.append((stairs.pop(char), index))
+                else:
+                    stairs[char] = index
+            elif char == 'j':
+                switches.append(index)
+            elif char == 'z':
+                chandeliers.append(index)
+        solid_rows.append(mask)
+
+    # Switches and chandeliers are paired in reading order, any extra
+    # switches drop the last chandelier
+    chandelier_links = []
+    for i, switch in enumerate(switches):
+        if chandeliers:
+            chandelier_links.append((switch, chandeliers[min(i, len(chandeliers) - 1)]))
+
+    return {
+        "width": max(len(line) for line in lines),
+        "height": len(lines),
+        "tiles": tiles,
+        "wall_runs": wall_runs,
+        "stair_pairs": stair_pairs,
+        "chandelier_links": chandelier_links,
+        "solid_rows": solid_rows,
+    }
+
+
+def cache_path(txt):
+    key = hashlib.sha1(("%d:%s" % (FORMAT_VERSION, txt)).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, key + ".level")
+
+
+def load_level(txt):
+    """ Return the CompiledLevel for a map, from the disk cache when it
+        has been compiled before. """
+    path = cache_path(txt)
+    try:
+        with open(path, "rb") as cache_file:
+            return CompiledLevel(marshal.load(cache_file))
+    except (IOError, OSError, EOFError, ValueError, TypeError, KeyError):
+        pass
+
+    data = compile_map(txt)
+    try:
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        # Write next to the final file and rename so a half written
+        # cache file is never read
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, "wb") as cache_file:
+            marshal.dump(data, cache_file)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        # The cache is only an optimization
+        pass
+    return CompiledLevel(data)
@@ -1,13 +1,26 @@
 import pygame
 
 import constants
+import guards
+from lod import GuardLOD
+import level_compiler
+import navigation
+from occlusion import Occlusion
 import platforms
+from assets import assets
+from camera import Camera
+from culling import CullingGroup
+from profiler import profiler
+from spatial import SpatialHash
+from static_layer import StaticLayer
+from streaming import ThingStream, GONE
+from triggers import TriggerIndex
 import thing
 
-from husband import Husband
+from husband import Husband, SightVolumes
 
 
-class Level():
+class Level(object):
     """ This is a generic super-class used to define a level.
         Create a child class for each level with level-specific
         info. """
@@ -25,21 +38,53 @@ class Level():
     active_sprites = None
     # Background image
     background = None
-
-    # How far this world has been scrolled left/right
-    world_shift = 0
+    # Wallpaper and walls baked into chunks, built on first draw
+    static_layer = None
+    # Platforms that move and so can't be part of the static layer
+    # or the solid index
+    moving_platforms = None
+    # Grid index of the platforms that don't move, for collisions
+    solid_index = None
+    # The compiled ASCII map, None for levels built by hand
+    compiled_map = None
+    # Where husbands can walk, see navigation.py
+    nav = None
+    # Walls husbands can't see through, None sees through everything
+    occlusion = None
+    # Makes and drops the things as the camera moves, None keeps them all
+    stream = None
+
+    # Updates the husbands when there are many of them, see guards.py
+    guard_engine = None
+    # Updates far husbands less often otherwise, see lod.py
+    guard_lod = None
+
+    # Viewport over the level; sprites keep world coordinates
+    camera = None
     level_limit = -1000
 
     def __init__(self, player, bad_guys):
         """ Constructor. Pass in a handle to player. Needed for when moving platforms
-            collide with the player. """
-        self.platform_list = pygame.sprite.Group()
-        self.thing_list = pygame.sprite.Group()
-        self.enemy_list = pygame.sprite.Group()
-        self.character_list = pygame.sprite.Group()
+            collide with the player. Groups keep the order sprites were
+            added in, so updates run in the same order every game. """
+        self.platform_list = pygame.sprite.OrderedUpdates()
+        self.moving_platforms = pygame.sprite.OrderedUpdates()
+        self.solid_index = SpatialHash(self.tileSize)
+        # Drawn only near the screen, see culling.py
+        self.thing_list = CullingGroup()
+        # The things in thing_list that react to being touched
+        self.triggers = TriggerIndex(self.tileSize)
+        self.enemy_list = CullingGroup()
+        self.character_list = pygame.sprite.OrderedUpdates()
+        self.camera = Camera()
+        self.sight_volumes = SightVolumes()
+        if constants.GUARDS_LOD:
+            self.guard_lod = GuardLOD()
+        # Each level gets its own list, levels add to it in place
+        self.wallpaper_points = []
         self.player = player
         self.husband = bad_guys[0]
-        self.active_sprites = pygame.sprite.Group()
+        self.active_sprites = pygame.sprite.OrderedUpdates()
         self.active_sprites.add(player)
 
         for bad_guy in bad_guys:
@@ -50,131 +95,267 @@ class Level():
         return [tile, x*self.tileSize, y*self.tileSize, passable]
 
     def generate_tiles(self, txt):
-        generated = []
-        txt = txt.split("\n")
-        result = []
-        for i in txt:
-            result.append(list(i))
-        for i in range(len(result)):
-            for j in range(len(result[i])):
-                if txt[i][j] != ' ':
-                    if txt[i][j] == '#':
-                        generated.append(self.one_tile(platforms.WALL_SPRITE, i, j, False))
-                        t = self.one_tile(platforms.WALL_SPRITE, i, j, False)
-                        block = platforms.Platform(t[0], t[1], t[2], self.player)
-                        self.platform_list.add(block)
-                    elif txt[i][j] != '.':
-                        # Put wallpaper behind other stuff (or nooot)
-                        t = thing.Thing
-                        if txt[i][j] == 'l':
-                            chosen_sprite = self.one_tile(thing.LADDER_SPRITE, i, j, self.player)
-                        elif txt[i][j] == 'w':
-                            chosen_sprite = self.one_tile(thing.WINDOW_WALL_SPRITE, i, j, self.player)
-                        elif txt[i][j] == 's':
-                            chosen_sprite = [thing.WARDROBE_OPEN, j*self.tileSize, i*self.tileSize, self.player, thing.WARDROBE_CLOSED, thing.WARDROBE_CLOSED2]
-                            t = thing.Wardrobe
-                        elif txt[i][j] == 'D':
-                            chosen_sprite = [thing.DOOR_CLOSED, j*self.tileSize, i*self.tileSize, self.active_sprites, thing.DOOR_OPEN]
-                            t = thing.Door
-                        elif txt[i][j] == 'f':
-                            #TODO: add different graphics
-                            chosen_sprite = [thing.DOOR_CLOSED, j*self.tileSize, i*self.tileSize, self.active_sprites, thing.DOOR_OPEN]
-                            t = thing.FinalDoor
-                        elif txt[i][j] == 'c':
-                            chosen_sprite = [thing.SOCK, j*self.tileSize, i*self.tileSize, self.active_sprites]
-                            t = thing.Clothing
-                        elif txt[i][j] == 'z':
-                            chosen_sprite = [thing.CHANDELIER, j*self.tileSize, i*self.tileSize, self.active_sprites, thing.CHANDELIER_FALLEN]
-                            t = thing.Chandelier
-                        elif txt[i][j] == 'j':
-                            chosen_sprite = [thing.CHANDELIER_SWITCH, j*self.tileSize, i*self.tileSize, self.active_sprites]
-                            t = thing.ChandelierSwitch
-                        elif txt[i][j] == 'b':
-                            chosen_sprite = self.one_tile(thing.BED, i, j, self.player)
-                        elif txt[i][j].isdigit():
-                            chosen_sprite = [thing.STAIR_SPRITE, j*self.tileSize, i*self.tileSize, self.active_sprites, txt[i][j]]
-                            t = thing.Staircase
-                        if chosen_sprite:
-                            block = t(*chosen_sprite)
-                            self.thing_list.add(block)
-                            self.match_doors()
-                            self.match_chandelier()
-
-        return generated
+        """ Build the sprites for an ASCII map. The map is compiled once
+            and cached on disk, see level_compiler. """
+        compiled = level_compiler.load_level(txt)
+        size = self.tileSize
+
+        # Each horizontal run of wall tiles is a single platform
+        for column, row, length in compiled.wall_runs:
+            block = platforms.Platform(platforms.WALL_SPRITE, column * size, row * size, self.player, length)
+            self.add_platform(block)
+
+        self.compiled_map = compiled
+        # Staircases lead to the tile of their pair
+        self._stair_pairs = {}
+        for first, second in compiled.stair_pairs:
+            self._stair_pairs[first] = second
+            self._stair_pairs[second] = first
+
+        if constants.STREAMING:
+            # Things near the camera are made as it moves, see streaming.py
+            self.stream = ThingStream(self, compiled)
+            self.stream.update(self.camera)
+        else:
+            self._make_things()
+
+        self.nav = navigation.load_graph(compiled, size)
+        self.occlusion = Occlusion(compiled, size)
+        if constants.GUARDS_CHASE:
+            for husband in self.enemy_list:
+                husband.nav = self.nav
+        return compiled
+
+    def make_thing(self, index):
+        """ The sprite for tile index of the compiled map, None for tiles
+            without one. Not added to any group. """
+        char, j, i = self.compiled_map.tiles[index]
+        size = self.tileSize
+        # Put wallpaper behind other stuff (or nooot)
+        t = thing.Thing
+        chosen_sprite = None
+        if char == 'l':
+            chosen_sprite = self.one_tile(thing.LADDER_SPRITE, i, j, self.player)
+        elif char == 'w':
+            chosen_sprite = self.one_tile(thing.WINDOW_WALL_SPRITE, i, j, self.player)
+        elif char == 's':
+            chosen_sprite = [thing.WARDROBE_OPEN, j*size, i*size, self.player, thing.WARDROBE_CLOSED, thing.WARDROBE_CLOSED2]
+            t = thing.Wardrobe
+        elif char == 'D':
+            chosen_sprite = [thing.DOOR_CLOSED, j*size, i*size, self.active_sprites, thing.DOOR_OPEN]
+            t = thing.Door
+        elif char == 'f':
+            #TODO: add different graphics
+            chosen_sprite = [thing.DOOR_CLOSED, j*size, i*size, self.active_sprites, thing.DOOR_OPEN]
+            t = thing.FinalDoor
+        elif char == 'c':
+            chosen_sprite = [thing.SOCK, j*size, i*size, self.active_sprites]
+            t = thing.Clothing
+        elif char == 'z':
+            chosen_sprite = [thing.CHANDELIER, j*size, i*size, self.active_sprites, thing.CHANDELIER_FALLEN]
+            t = thing.Chandelier
+        elif char == 'j':
+            chosen_sprite = [thing.CHANDELIER_SWITCH, j*size, i*size, self.active_sprites]
+            t = thing.ChandelierSwitch
+        elif char == 'b':
+            chosen_sprite = self.one_tile(thing.BED, i, j, self.player)
+        elif char.isdigit():
+            chosen_sprite = [thing.STAIR_SPRITE, j*size, i*size, self.active_sprites, char]
+            t = thing.Staircase
+
+        if not chosen_sprite:
+            return None
+        block = t(*chosen_sprite)
+        block.tile_index = index
+        if t is thing.Staircase and index in self._stair_pairs:
+            pair_char, pair_j, pair_i = self.compiled_map.tiles[self._stair_pairs[index]]
+            block.paired_position = (pair_j * size, pair_i * size)
+        return block
+
+    def _make_things(self, states=None):
+        """ Make the things of every tile, from the states of
+            thing_states() if given. """
+        compiled = self.compiled_map
+        sprites = []
+        for index in range(len(compiled.tiles)):
+            state = states[index] if states else None
+            block = None
+            if state != GONE:
+                block = self.make_thing(index)
+            if block:
+                if state is not None:
+                    block.restore(state)
+                self.add_thing(block)
+            sprites.append(block)
+        for switch, chandelier in compiled.chandelier_links:
+            sprites[switch].chandelier = sprites[chandelier]
+        # Tile index -> its thing, when there is no stream
+        self._things = sprites
+
+    def thing_states(self):
+        """ The state of the thing of every tile, see
+            Thing.dormant_state. Things that are gone are GONE. """
+        if self.stream:
+            return self.stream.states()
+        if self.compiled_map is None:
+            return []
+        return [block.dormant_state() if block and block.alive() else GONE for block in self._things]
+
+    def restore_things(self, states):
+        """ Go back to the states of an earlier thing_states(). """
+        if self.stream:
+            self.stream.restore(states, self.camera)
+        elif self.compiled_map is not None:
+            for block in self.thing_list.sprites():
+                self.remove_thing(block)
+            self._make_things(states)
+
+    def begin_step(self):
+        """ Called before each simulation step. Remembers where everything
+            that moves was, so drawing can interpolate between steps. """
+        self.camera.begin_step()
+        for group in (self.moving_platforms, self.active_sprites):
+            for sprite in group:
+                sprite.previous_position = sprite.rect.topleft
 
     # Update everythign on this level
     def update(self):
         """ Update everything in this level."""
-        self.platform_list.update()
-        self.thing_list.update()
-        self.enemy_list.update()
+        with profiler.phase("platforms"):
+            # Only moving platforms do anything in update
+            self.moving_platforms.update()
+        with profiler.phase("things"):
+            if self.stream:
+                self.stream.update(self.camera)
+            # Only the things something touches are called
+            self.triggers.update(self.active_sprites)
+        with profiler.phase("enemies"):
+            self.update_enemies()
         # Wardrobe removes sprite from all groups, fix so player can move around after getting into wardrobe
         if not self.active_sprites.has(self.player):
             self.active_sprites.add(self.player)
 
+    def patrol_state(self, husband):
+        """ husband.patrol_state() as of now, including the steps a far
+            husband still owes, see GuardLOD.state. Nobody is moved. """
+        if self.guard_lod:
+            return self.guard_lod.state(husband)
+        return husband.patrol_state()
+
+    def all_things(self):
+        """ Every thing in the level in map order, including the ones
+            the stream holds dormant. """
+        if self.stream:
+            return self.stream.all_things()
+        return list(self.thing_list)
+
+    def update_enemies(self):
+        if self.guard_engine is None and guards.available() and \
+                len(self.enemy_list) >= constants.VECTOR_GUARDS_MIN:
+            self.guard_engine = guards.GuardEngine()
+            self.guard_engine.load(self.enemy_list)
+
+        # Where the camera is at this step, not where it is drawn
+        camera = self.camera
+        viewport = pygame.Rect(camera.x, 0, camera.width, camera.height)
+        if self.guard_engine:
+            self.guard_engine.update(self.enemy_list, viewport)
+            self.enemy_list.moved(self.enemy_list)
+            self.guard_engine.check(self.player, self.occlusion)
+        elif self.guard_lod:
+            self.guard_lod.update(self.enemy_list, viewport)
+            self.enemy_list.moved(self.guard_lod.moved)
+            self.guard_lod.check(self.player, self.occlusion)
+        else:
+            self.enemy_list.update()
+            self.enemy_list.moved(self.enemy_list)
+            # Test the player against every husband's sight at once
+            self.sight_volumes.sync(self.enemy_list)
+            self.sight_volumes.check(self.player, self.occlusion)
+
     def draw(self, screen):
         """ Draw everything on this level. """
+        self.draw_background(screen)
+
+        # Draw all the sprite lists that we have
+        for group in self.sprite_groups():
+            self.camera.draw(screen, group)
+
+        self.draw_hud(screen)
+
+    def draw_background(self, screen):
+        """ Draw the parts of the level that only change when it scrolls. """
 
         # Draw the background
         # We don't shift the background as much as the sprites are shifted
         # to give a feeling of depth.
+        view_shift = -self.camera.view_x
         screen.fill(constants.BLUE)
-        screen.blit(self.background, (self.world_shift // 3, 0))
-
-        # Draw wallpaper
-        pygame.draw.polygon(screen, self.wallpaper_color, self.wallpaper_points)
-
-        # Draw all the sprite lists that we have
-        self.platform_list.draw(screen)
-        self.thing_list.draw(screen)
-        self.enemy_list.draw(screen)
-
-        self.husband.draw_suspicion_meter(screen)
+        screen.blit(self.background, (view_shift // 3, 0))
+
+        # Draw wallpaper and walls
+        if self.static_layer is None:
+            self.build_static_layer()
+        self.static_layer.draw(screen, view_shift)
+
+    def sprite_groups(self):
+        """ Sprite groups drawn on top of the background, bottom first. """
+        if self.static_layer is None:
+            self.build_static_layer()
+        return [self.moving_platforms, self.thing_list, self.enemy_list]
+
+    def draw_hud(self, screen):
+        """ Draw the overlay, returns the rects it covers. """
+        return [self.husband.draw_suspicion_meter(screen)]
+
+    def build_static_layer(self):
+        """ Bake the wallpaper and every platform that doesn't move into
+            the static layer. Call again after changing the geometry. """
+        static = [platform for platform in self.platform_list
+                  if not self.moving_platforms.has(platform)]
+
+        self.static_layer = StaticLayer()
+        self.static_layer.build(static, self.wallpaper_points, self.wallpaper_color)
+
+    def add_platform(self, platform):
+        """ Add a platform to the level. Platforms that don't move go into
+            the solid index, moving ones are checked one by one. """
+        self.platform_list.add(platform)
+        if isinstance(platform, platforms.MovingPlatform):
+            self.moving_platforms.add(platform)
+        else:
+            self.solid_index.insert(platform)
+
+    def add_thing(self, thing):
+        self.thing_list.add(thing)
+        if thing.trigger:
+            self.triggers.add(thing)
+
+    def remove_thing(self, thing):
+        self.triggers.remove(thing)
+        thing.kill()
+
+    def collide_platforms(self, sprite):
+        """ Platforms that collide with the sprite. Only looks at the grid
+            cells around the sprite instead of every platform. """
+        hits = self.solid_index.query(sprite.rect)
+        for platform in self.moving_platforms:
+            if sprite.rect.colliderect(platform.rect):
+                hits.append(platform)
+        return hits
+
+    @property
+    def world_shift(self):
+        """ How far this world has been scrolled left/right """
+        return -self.camera.x
 
     def shift_world(self, shift_x):
-        """ When the user moves left/right and we need to scroll everything: """
-
-        # Keep track of the shift amount
-        self.world_shift += shift_x
-
-        # Go through all the sprite lists and shift
-        for platform in self.platform_list:
-            platform.rect.x += shift_x
-
-        for the_thing in self.thing_list:
-            the_thing.rect.x += shift_x
-
-        for enemy in self.enemy_list:
-            enemy.rect.x += shift_x
-
-        for x in self.wallpaper_points:
-            x[0] += shift_x
-
-    def match_doors(self):
-        door_dict = {}
-        for i in self.thing_list:
-            if isinstance(i, thing.Staircase):
-                if i.door_number in door_dict:
-                    i.paired_door = door_dict[i.door_number]
-                    door_dict[i.door_number].paired_door = i
-                else:
-                    door_dict[i.door_number] = i
+        """ When the user moves left/right and we need to scroll everything.
+            Sprites stay in world coordinates, only the camera moves. """
+        self.camera.scroll(shift_x)
 
     def translate_wallpaper(self):
         self.wallpaper_points = [[x * self.tileSize for x in y] for y in self.wallpaper_points]  # Fuck yeah
-        print self.wallpaper_points
-
-    def match_chandelier(self):
-        chandelier = None
-        switch = None
-        for i in self.thing_list:
-            if isinstance(i, thing.Chandelier):
-                chandelier = i
-            if isinstance(i, thing.ChandelierSwitch):
-                switch = i
-
-        if switch and chandelier:
-            switch.chandelier = chandelier
 
 
 # Create platforms for the level
@@ -187,7 +368,7 @@ class Level01(Level):
         # Call the parent constructor
         Level.__init__(self, player, bad_guys)
 
-        self.background = pygame.image.load("img/background_01.png").convert()
+        self.background = assets.get("img/background_01.png")
         self.background.set_colorkey(constants.WHITE)
         self.level_limit = -2500
 
@@ -219,7 +400,7 @@ class Level02(Level):
         # Call the parent constructor
         Level.__init__(self, player, husband)
 
-        self.background = pygame.image.load("img/background_02.png").convert()
+        self.background = assets.get("img/background_02.png")
         self.background.set_colorkey(constants.WHITE)
         self.level_limit = -1000
 
@@ -241,7 +422,7 @@ class Level02(Level):
         # Go through the array above and add platforms
         for platform in level:
             block = platforms.Platform(platform[0], platform[1], platform[2], self.player)
-            self.platform_list.add(block)
+            self.add_platform(block)
 
         # Add a custom moving platform
         block = platforms.MovingPlatform(platforms.STONE_PLATFORM_MIDDLE, 1500, 300, self.player)
@@ -252,4 +433,4 @@ class Level02(Level):
         block.change_y = -1
         block.player = self.player
         block.level = self
-        self.platform_list.add(block)
+        self.add_platform(block)
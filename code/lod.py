@@ -0,0 +1,164 @@
+"""
+Level of detail for the AI of husbands far from the camera.
+
+Husbands that can reach the screen, or see into it, run their full
+update every step. The others only patrol, and nobody sees them do it:
+they are left alone for a few steps and then catch up all at once with
+Husband.catch_up, which walks them straight to the ends of their zone
+instead of step by step and chooses no frames. The further away, the
+longer they are left alone. A timing wheel says whose turn it is, so a
+step costs nothing for husbands that are waiting.
+
+Catching up ends in the same place as stepping, as long as all husbands
+walk at the same speed, so everyone catches up whenever the speed
+changes. Their sight is only tested while they are near: a husband
+further than his sight from the screen can't see the player.
+
+state() tells where a husband would be after catching up without moving
+him, for snapshots and digests.
+"""
+from husband import Husband, SightVolumes
+from scheduler import TimingWheel
+from timing import sim_clock
+
+# Husbands whose sight gets this close to the screen, in pixels, are
+# updated every step. Has to be more than anyone walks between two
+# catch ups.
+NEAR_MARGIN = 400
+# (farther than, steps between catch ups)
+TIERS = ((NEAR_MARGIN, 4), (2000, 16))
+# Slots of the timing wheel, the longest interval fits in one turn
+WHEEL_SIZE = 32
+
+
+def distance(husband, viewport):
+    """ Pixels between the screen and the part of the world the husband
+        covers with his body and his sight. """
+    left = husband.rect.left - husband.sight_width
+    right = husband.rect.right + husband.sight_width
+    return max(viewport.left - right, left - viewport.right, 0)
+
+
+def interval(husband, viewport):
+    """ Steps between two updates of the husband, 1 for every step. """
+    if husband._home is not None:
+        # Chasing or going home, the way depends on every step
+        return 1
+    gap = distance(husband, viewport)
+    steps = 1
+    for far, tier_steps in TIERS:
+        if gap > far:
+            steps = tier_steps
+    return steps
+
+
+class GuardLOD(object):
+    """ Updates the sprites of a group, the husbands among them in as
+        much detail as they need. """
+
+    def __init__(self):
+        self.wheel = TimingWheel(WHEEL_SIZE)
+        # Sprites updated every step
+        self.near = []
+        # Husbands left alone -> tick they are up to date with
+        self.waiting = {}
+        self.sight = SightVolumes()
+        # Speed the waiting husbands walk at
+        self.speed = None
+        # Part of the world on screen at this step
+        self.viewport = None
+        # Husbands that came near during this step
+        self._joining = []
+        # Sprites that moved during this step
+        self.moved = []
+        self._group_size = None
+
+    def load(self, group):
+        """ Sort the sprites of the group by how far they are. Called at
+            the start of a step, before anyone moved. """
+        self.catch_up(sim_clock.ticks - 1)
+        self.wheel.reset(sim_clock.ticks)
+        self.waiting = {}
+        self.near = []
+        for sprite in group:
+            if isinstance(sprite, Husband) and interval(sprite, self.viewport) > 1:
+                self._wait(sprite, sim_clock.ticks - 1)
+            else:
+                self.near.append(sprite)
+        self.sight.load(self.near)
+        self._group_size = len(group)
+
+    def _wait(self, husband, since):
+        """ Leave the husband alone, he is up to date with tick since. """
+        self.waiting[husband] = since
+        due = sim_clock.ticks + interval(husband, self.viewport)
+        self.wheel.at(due, lambda: self._due(husband))
+
+    def _due(self, husband):
+        if husband not in self.waiting:
+            return
+        self.catch_up(sim_clock.ticks, [husband])
+        del self.waiting[husband]
+        self.moved.append(husband)
+        if not husband.alive():
+            return
+        if interval(husband, self.viewport) > 1:
+            self._wait(husband, sim_clock.ticks)
+        else:
+            husband._choose_frame()
+            self._joining.append(husband)
+
+    def state(self, husband):
+        """ The patrol_state() of a husband as of now, as if he had caught
+            up. Nobody is moved. """
+        tick = self.waiting.get(husband)
+        if tick is None or sim_clock.ticks <= tick:
+            return husband.patrol_state()
+        return husband.patrolled(sim_clock.ticks - tick, self.speed)
+
+    def catch_up(self, upto=None, husbands=None):
+        """ Bring the waiting husbands up to date with tick upto, the
+            current one by default. """
+        ticks = sim_clock.ticks if upto is None else upto
+        for husband in husbands or list(self.waiting):
+            tick = self.waiting[husband]
+            if ticks > tick:
+                husband.catch_up(ticks - tick, self.speed)
+                self.waiting[husband] = ticks
+
+    def update(self, group, viewport):
+        """ One step for every sprite in the group. viewport is the part
+            of the world on screen. """
+        self.viewport = viewport
+        speed = Husband.speed()
+        if speed != self.speed:
+            # Steps owed so far were walked at the old speed
+            self.catch_up(sim_clock.ticks - 1)
+            self.speed = speed
+
+        if len(group) != self._group_size:
+            self.load(group)
+
+        # Husbands coming near catch up with this step and join afterwards
+        del self.moved[:]
+        self.wheel.run(sim_clock.ticks)
+        self.moved.extend(self.near)
+
+        leaving = None
+        for sprite in self.near:
+            sprite.update()
+            if isinstance(sprite, Husband) and sprite.alive() and interval(sprite, viewport) > 1:
+                self._wait(sprite, sim_clock.ticks)
+                if leaving is None:
+                    leaving = set()
+                leaving.add(sprite)
+        if leaving or self._joining:
+            if leaving:
+                self.near = [sprite for sprite in self.near if sprite not in leaving]
+            self.near.extend(self._joining)
+            del self._joining[:]
+            self.sight.load(self.near)
+
+    def check(self, player, occlusion=None):
+        """ SightVolumes.check for the husbands near the screen. """
+        self.sight.check(player, occlusion)
@@ -0,0 +1,146 @@
+"""
+Navigation graph over a compiled level.
+
+Every tile a husband can stand on, an empty tile with a wall under it,
+is a node. Nodes are linked to their left and right neighbours and each
+staircase to the one it leads to. Paths are kept as next hop tables:
+table[target][node] is the node to go to from node on a shortest path
+to target, so following a path costs one lookup per tile.
+
+For small levels the tables for every target are worked out when the
+level is loaded and cached on disk next to the compiled map. Bigger
+levels get the table of a target the first time it is asked for.
+"""
+import hashlib
+import marshal
+import os
+from collections import deque
+
+import level_compiler
+
+# Bump when the cached format changes so old cache files are ignored
+FORMAT_VERSION = 1
+
+# Levels with up to this many nodes get all their tables up front
+ALL_PAIRS_LIMIT = 512
+
+UNREACHABLE = -1
+
+
+class NavGraph(object):
+    """ Walkable tiles and the links between them. """
+
+    def __init__(self, data, tile_size):
+        self.tile_size = tile_size
+        # (column, row) of every node
+        self.cells = [tuple(cell) for cell in data["cells"]]
+        # Indexes of the nodes next to each node
+        self.neighbours = data["neighbours"]
+        # (node, node) pairs linked by staircases, both ways
+        self.stairs = set()
+        for a, b in data["stairs"]:
+            self.stairs.add((a, b))
+            self.stairs.add((b, a))
+        # target -> next hop table
+        self.tables = dict(data.get("tables", {}))
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def node_at(self, x, y):
+        """ Node of the tile at a point in world coordinates, or None. """
+        return self.index.get((x // self.tile_size, y // self.tile_size))
+
+    def is_stair(self, node, hop):
+        return (node, hop) in self.stairs
+
+    def table(self, target):
+        table = self.tables.get(target)
+        if table is None:
+            table = self.tables[target] = shortest_paths(self.neighbours, target)
+        return table
+
+    def next_hop(self, node, target):
+        """ Next node on the way from node to target, target itself once
+            there, None if target can't be reached. """
+        hop = self.table(target)[node]
+        return None if hop == UNREACHABLE else hop
+
+
+def shortest_paths(neighbours, target):
+    """ Breadth first search out from target. Every node ends up pointing
+        at the node it was reached from, which is one step closer. """
+    table = [UNREACHABLE] * len(neighbours)
+    table[target] = target
+    queue = deque([target])
+    while queue:
+        node = queue.popleft()
+        for other in neighbours[node]:
+            if table[other] == UNREACHABLE:
+                table[other] = node
+                queue.append(other)
+    return table
+
+
+def build_graph(compiled):
+    """ The nodes and links of a CompiledLevel, as plain data. """
+    cells = []
+    index = {}
+    for row in range(compiled.height - 1):
+        for column in range(compiled.width):
+            if not compiled.is_solid(column, row) and compiled.is_solid(column, row + 1):
+                index[(column, row)] = len(cells)
+                cells.append((column, row))
+
+    neighbours = []
+    for column, row in cells:
+        linked = []
+        for other in ((column - 1, row), (column + 1, row)):
+            if other in index:
+                linked.append(index[other])
+        neighbours.append(linked)
+
+    stairs = []
+    for first, second in compiled.stair_pairs:
+        a = index.get(compiled.tiles[first][1:])
+        b = index.get(compiled.tiles[second][1:])
+        if a is not None and b is not None:
+            neighbours[a].append(b)
+            neighbours[b].append(a)
+            stairs.append((a, b))
+
+    return {"cells": cells, "neighbours": neighbours, "stairs": stairs}
+
+
+def cache_path(compiled):
+    key = hashlib.sha1(marshal.dumps((FORMAT_VERSION, compiled.width, compiled.height,
+                                      compiled.solid_rows, compiled.tiles, compiled.stair_pairs)))
+    return os.path.join(level_compiler.CACHE_DIR, key.hexdigest() + ".nav")
+
+
+def load_graph(compiled, tile_size):
+    """ Return the NavGraph of a CompiledLevel, from the disk cache when
+        it has been built before. """
+    path = cache_path(compiled)
+    try:
+        with open(path, "rb") as cache_file:
+            return NavGraph(marshal.load(cache_file), tile_size)
+    except (IOError, OSError, EOFError, ValueError, TypeError, KeyError):
+        pass
+
+    data = build_graph(compiled)
+    if len(data["cells"]) <= ALL_PAIRS_LIMIT:
+        neighbours = data["neighbours"]
+        data["tables"] = dict((target, shortest_paths(neighbours, target)) for target in range(len(neighbours)))
+    try:
+        if not os.path.isdir(level_compiler.CACHE_DIR):
+            os.makedirs(level_compiler.CACHE_DIR)
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, "wb") as cache_file:
+            marshal.dump(data, cache_file)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        # The cache is only an optimization
+        pass
+    return NavGraph(data, tile_size)
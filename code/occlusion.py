@@ -0,0 +1,48 @@
+"""
+Line of sight over the wall tiles of a compiled level.
+
+Husbands look along the row they stand on. Every row is cut by its wall
+tiles into spans of open tiles, and two points on a row can see each
+other if they are in the same span. The span of every tile is worked
+out once when the level is loaded, so a test is two list lookups.
+"""
+
+# Span index of a wall tile
+WALL = -1
+
+
+class Occlusion(object):
+
+    def __init__(self, compiled, tile_size):
+        self.tile_size = tile_size
+        # One list per row with the span index of every column
+        self.spans = []
+        span = 0
+        for row in range(compiled.height):
+            columns = []
+            open_run = False
+            for column in range(compiled.width):
+                if compiled.is_solid(column, row):
+                    columns.append(WALL)
+                    if open_run:
+                        span += 1
+                    open_run = False
+                else:
+                    columns.append(span)
+                    open_run = True
+            if open_run:
+                span += 1
+            self.spans.append(columns)
+
+    def clear(self, x1, x2, y):
+        """ True if no wall is between x1 and x2 on the row at y, all in
+            world coordinates. Points off the map are never hidden. """
+        tile = self.tile_size
+        row = y // tile
+        if row < 0 or row >= len(self.spans):
+            return True
+        spans = self.spans[row]
+        column1, column2 = x1 // tile, x2 // tile
+        if not (0 <= column1 < len(spans) and 0 <= column2 < len(spans)):
+            return True
+        return spans[column1] == spans[column2] != WALL
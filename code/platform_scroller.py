@@ -24,43 +24,36 @@ http://opengameart.org/content/platformer-art-deluxe
 
 """
 
+import argparse
+
 import pygame
 
-import time
 from pygame.constants import FULLSCREEN
 import constants
-from husband import Husband
-import levels
-import dialog
-
-from player import Player
-
-current_message = "Oh no! It's my husband!"
-message_expire = None
-message_display_time = 2
-
-def show_help(screen):
-    textcolor = (255, 255, 255)
-    font = pygame.font.Font('resources/FreeMono.ttf', 18)
-    help_text = ["Help", "Move around    arrow keys", "Use sword  space"]
-    for i, line in enumerate(help_text):
-        angle_display = font.render(line, 0, textcolor)
-        screen.blit(angle_display, (0, 18 * i))
-
-
-def print_msg(message, x, y, screen):
-    txt = dialog.Dialog(x, y, message)
-    txt.draw(screen)
-
-
-def main():
-    """ Main Program """
+from assets import assets
+from audio import audio
+from game import Game
+from profiler import profiler
+import replay
+from renderer import DirtyRenderer, FullRenderer
+import snapshot
+from timing import sim_clock
+
+
+def main(dirty_rendering=constants.DIRTY_RENDERING, record=None, replay_file=None,
+         profile=constants.PROFILING, trace_file=None):
+    """ Main Program. With dirty_rendering only the changed parts of
+        the screen are redrawn each frame. record is a file to save the
+        input to when the game ends, replay_file a recording to play
+        instead of reading the keyboard. profile shows the frame times
+        on screen (F3 toggles them) and prints how long the assets took
+        to load, trace_file is where to save a Chrome trace of the
+        frames when the game ends. """
+    profiler.enabled = profiler.requested = bool(profile or trace_file)
+    profiler.show_overlay = bool(profile)
     pygame.init()
     pygame.font.init()
-    pygame.mixer.init()
-    global current_message, message_expire, message_display_time
-    # music = pygame.mixer.Sound("resources/DST-Arch-Delerium.ogg")
-    #music.play(loops=-1)
+    audio.init()
 
     # Set the height and width of the screen
     size = [constants.SCREEN_WIDTH, constants.SCREEN_HEIGHT]
@@ -71,154 +64,80 @@ def main():
 
     pygame.display.set_caption("Honey, I'm home!")
 
-    # Create the player
-    player = Player()
-
-    bad_guys = []
-
-    # Add husband
-    husband = Husband("husband", [0, 420])
-    husband.rect.x = 2310
-    husband.rect.y = constants.SCREEN_HEIGHT - husband.rect.height - 100
-    husband.player = player
-    bad_guys.append(husband)
-
-    # Add guard
-    guard = Husband("guard 0", [0, 420], "img/husband2.png")
-    guard.rect.x = 2310
-    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 380
-    guard.player = player
-    bad_guys.append(guard)
-
-    # Add guard
-    guard = Husband("guard 1", [0, 420], "img/husband2.png")
-    guard.rect.x = 1100
-    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 380
-    guard.player = player
-    bad_guys.append(guard)
-
-    # Add guard
-    guard = Husband("guard 2", [0, 350], "img/husband2.png")
-    guard.rect.x = 970
-    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 240
-    guard.player = player
-    bad_guys.append(guard)
-
-    # Add guard
-    guard = Husband("guard 3", [0, 140], "img/husband2.png")
-    guard.rect.x = 1010
-    guard.rect.y = constants.SCREEN_HEIGHT - guard.rect.height - 100
-    guard.player = player
-    bad_guys.append(guard)
-
-    # Create all the levels
-    level_list = [levels.Level01(player, bad_guys)]
-    #level_list.append(levels.Level_02(player))
-
-    # Set the current level
-    current_level_no = 0
-    current_level = level_list[current_level_no]
-
-    active_sprite_list = pygame.sprite.Group()
-    player.level = current_level
-    player.sprite_list = active_sprite_list
-    player.rect.x = 340
-    player.rect.y = constants.SCREEN_HEIGHT - player.rect.height - 30
-    active_sprite_list.add(player)
+    # Start decoding the images while the rest of the game is set up
+    assets.preload(background=True)
 
-    #Loop until the user clicks the close button.
-    done = False
+    # Create the player, the bad guys and all the levels
+    game = Game()
+
+    recording = None
+    script = {}
+    if replay_file:
+        recording = replay.load(replay_file)
+        script = recording.script
+    elif record:
+        game.recorder = replay.Recorder()
+    if not replay_file and constants.REWIND_SECONDS:
+        game.rewind = snapshot.Rewind(constants.REWIND_SECONDS, constants.REWIND_EVERY)
+
+    # Only what happens on screen can be heard
+    audio.listen(lambda noise: game.current_level.camera.viewport.collidepoint(noise.x, noise.y))
+    if constants.MUSIC:
+        audio.play_music(constants.MUSIC)
+
+    if profile:
+        for line in assets.report():
+            print(line)
 
     # Used to manage how fast the screen updates
     clock = pygame.time.Clock()
 
-    time_start = time.time()
-    dead = False
+    if dirty_rendering:
+        renderer = DirtyRenderer()
+    else:
+        renderer = FullRenderer()
+
+    clock.tick()
     # -------- Main Program Loop -----------
-    while not done:
-        for event in pygame.event.get():  # User did something
-            if event.type == pygame.QUIT:  # If user clicked close
-                done = True  # Flag that we are done so we exit this loop
-            if event.type == pygame.USEREVENT:
-                if event.dict["action"] == constants.MESSAGE:
-                    current_message = event.dict["message"]
-                    message_display_time = event.dict["time"]
-                    #done = True
-
-                if event.dict.get("kill", False) and not dead:
-                    dead = True
-
-            if event.type == pygame.KEYDOWN :
-                if event.key == pygame.K_ESCAPE:
-                    done = True
-                if not dead:
-                    if event.key == pygame.K_LEFT:
-                        player.go_left()
-                    if event.key == pygame.K_RIGHT:
-                        player.go_right()
-                    if event.key == pygame.K_UP:
-                        player.jump()
-                    if event.key == pygame.K_SPACE:
-                        player.disable_movement()
-
-            if event.type == pygame.KEYUP:
-                if event.key == pygame.K_LEFT and player.change_x < 0:
-                    player.stop()
-                if event.key == pygame.K_RIGHT and player.change_x > 0:
-                    player.stop()
-                if event.key == pygame.K_SPACE:
-                    player.enable_movement()
-
-
-        # Update the player.
-        active_sprite_list.update()
-
-        # Update items in the level
-        current_level.update()
-
-        # If the player gets near the right side, shift the world left (-x)
-        if player.rect.x >= 500:
-            diff = player.rect.x - 500
-            player.rect.x = 500
-            current_level.shift_world(-diff)
-
-        # If the player gets near the left side, shift the world right (+x)
-        if player.rect.x <= 120:
-            diff = 120 - player.rect.x
-            player.rect.x = 120
-            current_level.shift_world(diff)
-
-        # If the player gets to the end of the level, go to the next level
-        current_position = player.rect.x + current_level.world_shift
-        if current_position < current_level.level_limit:
-            player.rect.x = 120
-            if current_level_no < len(level_list) - 1:
-                current_level_no += 1
-                current_level = level_list[current_level_no]
-                player.level = current_level
+    #Loop until the user clicks the close button.
+    while not game.done:
+        profiler.begin_frame()
+        with profiler.phase("event pump"):
+            for event in pygame.event.get():  # User did something
+                if recording and event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key != pygame.K_ESCAPE:
+                    # Keys come from the recording
+                    continue
+                game.handle_event(event)
+
+        # Limit to 60 frames per second
+        frame_time = clock.tick(60) / 1000.0
+
+        # Run as many fixed simulation steps as the frame took. A slow
+        # frame runs more steps instead of slowing the game down.
+        for tick in sim_clock.steps(frame_time):
+            for key, down in script.get(tick, ()):
+                game.handle_key(key, down)
+            game.step()
+            if recording and tick >= recording.ticks:
+                print("replay matches recorded state: %s" % recording.matches(game))
+                game.done = True
+                break
 
         # ALL CODE TO DRAW SHOULD GO BELOW THIS COMMENT
-        current_level.draw(screen)
-        active_sprite_list.draw(screen)
-        #show_help(screen)
-
-        if time.time() - time_start < 4 and time.time() - time_start > 2:
-            print_msg("WHAT DO WE DO NOW?!?", 10, 510, screen)
-
-        if current_message:
-            print_msg(current_message, 10, 510, screen)
-            if not message_expire:
-                message_expire = time.time()
-        if message_expire and time.time() - message_expire > message_display_time:
-            current_message = None
-            message_expire = None
+        game.draw(screen, renderer)
         # ALL CODE TO DRAW SHOULD GO ABOVE THIS COMMENT
 
-        # Limit to 60 frames per second
-        clock.tick(60)
+        audio.update()
 
         # Go ahead and update the screen with what we've drawn.
-        pygame.display.flip()
+        with profiler.phase("flip"):
+            renderer.present()
+        profiler.end_frame()
+
+    if game.recorder:
+        game.recorder.save(record, game)
+    if trace_file:
+        profiler.export_chrome_trace(trace_file)
 
     # Be IDLE friendly. If you forget this line, the program will 'hang'
     # on exit.
@@ -226,4 +145,12 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Honey, I'm home!")
+    parser.add_argument("--dirty", action="store_true", help="redraw only the parts of the screen that changed")
+    parser.add_argument("--record", metavar="FILE", help="save the input to FILE when the game ends")
+    parser.add_argument("--replay", metavar="FILE", help="play back a recording instead of reading the keyboard")
+    parser.add_argument("--profile", action="store_true", help="show frame times on screen, F3 toggles them, and print asset load times")
+    parser.add_argument("--trace", metavar="FILE", help="save a Chrome trace of the frames to FILE when the game ends")
+    args = parser.parse_args()
+    main(constants.DIRTY_RENDERING or args.dirty, args.record, args.replay,
+         constants.PROFILING or args.profile, args.trace)
@@ -25,24 +25,45 @@ WALL_SPRITE           = (504, 288, 70, 70)
 class Platform(pygame.sprite.Sprite):
     """ Platform the user can jump on """
 
-    def __init__(self, sprite_sheet_data, x, y, player):
+    # The static layer draws runs tile by tile, the repeated image is
+    # only made if a run is drawn as a sprite
+    _image = None
+
+    def __init__(self, sprite_sheet_data, x, y, player, tiles=1):
         """ Platform constructor. Assumes constructed with user passing in
             an array of 5 numbers like what's defined at the top of this
-            code. """
+            code. With tiles > 1 the image is repeated that many times
+            to the right, so a run of wall tiles is a single platform. """
         pygame.sprite.Sprite.__init__(self)
 
         sprite_sheet = SpriteSheet("img/things_spritesheet2.png")
-        # Grab the image for this platform
-        self.image = sprite_sheet.get_image(sprite_sheet_data[0],
-                                            sprite_sheet_data[1],
-                                            sprite_sheet_data[2],
-                                            sprite_sheet_data[3])
-
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
+        # Grab the image for this platform, shared by all platforms with
+        # the same tile
+        self.tile_image = sprite_sheet.get_image(sprite_sheet_data[0],
+                                                 sprite_sheet_data[1],
+                                                 sprite_sheet_data[2],
+                                                 sprite_sheet_data[3])
+        self.tiles = tiles
+        if tiles == 1:
+            self.image = self.tile_image
+
+        self.rect = pygame.Rect(x, y, sprite_sheet_data[2] * tiles, sprite_sheet_data[3])
         self.player = player
 
+    @property
+    def image(self):
+        if self._image is None:
+            width = self.tile_image.get_width()
+            self._image = pygame.Surface([width * self.tiles, self.tile_image.get_height()]).convert()
+            for i in range(self.tiles):
+                self._image.blit(self.tile_image, (i * width, 0))
+            self._image.set_colorkey(self.tile_image.get_colorkey())
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image = image
+
 
 class MovingPlatform(Platform):
     """ This is a fancier platform that can actually move. """
@@ -57,6 +78,9 @@ class MovingPlatform(Platform):
     level = None
     player = None
 
+    # Position before the last simulation step, for interpolated drawing
+    previous_position = None
+
     def update(self):
         """ Move the platform.
             If the player is in the way, it will shove the player
@@ -102,6 +126,6 @@ class MovingPlatform(Platform):
         if self.rect.bottom > self.boundary_bottom or self.rect.top < self.boundary_top:
             self.change_y *= -1
 
-        cur_pos = self.rect.x - self.level.world_shift
+        cur_pos = self.rect.x
         if cur_pos < self.boundary_left or cur_pos > self.boundary_right:
             self.change_x *= -1
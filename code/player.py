@@ -6,8 +6,9 @@ import pygame
 
 import constants
 
+from events import bus, Noise
 from platforms import MovingPlatform
-from spritesheet_functions import SpriteSheet
+from spritesheet_functions import frames
 
 
 class Player(pygame.sprite.Sprite):
@@ -31,14 +32,17 @@ class Player(pygame.sprite.Sprite):
 
     # This holds all the images for the animated walk left/right
     # of our player
-    walking_frames_l = []
-    walking_frames_r = []
-    walking_frames_u = []
-    walking_frames_d = []
+    walking_frames_l = ()
+    walking_frames_r = ()
+    walking_frames_u = ()
+    walking_frames_d = ()
 
     # What direction is the player facing?
     direction = "R"
 
+    # Position before the last simulation step, for interpolated drawing
+    previous_position = None
+
     # List of sprites we can bump against
     level = None
 
@@ -49,24 +53,14 @@ class Player(pygame.sprite.Sprite):
         # Call the parent's constructor
         pygame.sprite.Sprite.__init__(self)
 
-        sprite_sheet = SpriteSheet("img/player.png")
-        # Load all the right facing images into a list
-
-        for i in range(7):
-            image = sprite_sheet.get_image(i * self.PL_WIDTH, 3 * self.PL_HEIGHT, self.PL_WIDTH,
-                                           self.PL_HEIGHT - self.PL_MARGIN)
-            self.walking_frames_r.append(image)
-        for i in range(7):
-            image = sprite_sheet.get_image(i * self.PL_WIDTH, 2 * self.PL_HEIGHT, self.PL_WIDTH,
-                                           self.PL_HEIGHT - self.PL_MARGIN)
-            self.walking_frames_l.append(image)
-        for i in range(7):
-            image = sprite_sheet.get_image(i * self.PL_WIDTH, self.PL_HEIGHT, self.PL_WIDTH,
-                                           self.PL_HEIGHT - self.PL_MARGIN)
-            self.walking_frames_u.append(image)
-        for i in range(7):
-            image = sprite_sheet.get_image(i * self.PL_WIDTH, 0, self.PL_WIDTH, self.PL_HEIGHT - self.PL_MARGIN)
-            self.walking_frames_d.append(image)
+        # The frames are shared by every player, each gets its own tuples
+        # instead of adding to lists on the class
+        sheet = "img/player.png"
+        height = self.PL_HEIGHT - self.PL_MARGIN
+        self.walking_frames_r = frames.strip(sheet, 0, 3 * self.PL_HEIGHT, self.PL_WIDTH, height, 7)
+        self.walking_frames_l = frames.strip(sheet, 0, 2 * self.PL_HEIGHT, self.PL_WIDTH, height, 7)
+        self.walking_frames_u = frames.strip(sheet, 0, self.PL_HEIGHT, self.PL_WIDTH, height, 7)
+        self.walking_frames_d = frames.strip(sheet, 0, 0, self.PL_WIDTH, height, 7)
 
         # Set the image the player starts with
         self.image = self.walking_frames_r[0]
@@ -83,7 +77,7 @@ class Player(pygame.sprite.Sprite):
 
             # Move left/right
             self.rect.x += self.change_x
-            pos = self.rect.x + self.level.world_shift
+            pos = self.rect.x
             if self.direction == "R":
                 frame = (pos // 30) % len(self.walking_frames_r)
                 self.image = self.walking_frames_r[frame]
@@ -92,7 +86,7 @@ class Player(pygame.sprite.Sprite):
                 self.image = self.walking_frames_l[frame]
 
             # See if we hit anything
-            block_hit_list = pygame.sprite.spritecollide(self, self.level.platform_list, False)
+            block_hit_list = self.level.collide_platforms(self)
             for block in block_hit_list:
                 # If we are moving right,
                 # set our right side to the left side of the item we hit
@@ -106,7 +100,7 @@ class Player(pygame.sprite.Sprite):
             self.rect.y += self.change_y
 
             # Check and see if we hit anything
-            block_hit_list = pygame.sprite.spritecollide(self, self.level.platform_list, False)
+            block_hit_list = self.level.collide_platforms(self)
             for block in block_hit_list:
 
                 # Reset our position based on the top/bottom of the object.
@@ -142,12 +136,13 @@ class Player(pygame.sprite.Sprite):
         # when working with a platform moving down.
         if self._enabled:
             self.rect.y += 2
-            platform_hit_list = pygame.sprite.spritecollide(self, self.level.platform_list, False)
+            platform_hit_list = self.level.collide_platforms(self)
             self.rect.y -= 2
 
             # If it is ok to jump, set our speed upwards
             if len(platform_hit_list) > 0 or self.rect.bottom >= constants.SCREEN_HEIGHT:
                 self.change_y = -10
+                bus.publish(constants.JUMP_EVENT, Noise(*self.rect.midbottom))
 
     # Player-controlled movement:
     def go_left(self):
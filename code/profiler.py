@@ -0,0 +1,157 @@
+"""
+Per-frame profiler for the phases of the main loop.
+
+Code marks a phase with
+
+    with profiler.phase("Level.update"):
+        ...
+
+When the profiler is disabled phase() hands back a shared object that
+does nothing, so the hooks can stay in place. When it is enabled every
+phase is timed, the last frames are kept for an on-screen graph, and
+all phases can be exported as a Chrome trace (chrome://tracing or
+https://ui.perfetto.dev).
+"""
+import json
+from collections import deque
+from timeit import default_timer
+
+import pygame
+
+from fonts import fonts, HELP_FONT
+
+# Frame time that the graph is scaled to, in seconds
+GRAPH_SCALE = 1 / 30.0
+GRAPH_HEIGHT = 60
+OVERLAY_FONT_SIZE = 12
+OVERLAY_LINES = 6
+
+
+class _NullPhase(object):
+    """ What phase() returns while the profiler is off. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase(object):
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, default_timer())
+        return False
+
+
+class Profiler(object):
+    """ Times the phases of each frame. """
+
+    def __init__(self, history=120, max_events=200000):
+        self.enabled = False
+        # Profiling asked for when the game started, the overlay alone
+        # only keeps it on while it is shown
+        self.requested = False
+        self.show_overlay = False
+        # Length of the last frames, in seconds
+        self.frame_times = deque(maxlen=history)
+        # phase -> seconds spent in it during the last whole frame
+        self.last_frame = {}
+        # (name, start, end) of every phase, oldest dropped first
+        self.events = deque(maxlen=max_events)
+        self._origin = default_timer()
+        self._frame_start = None
+        self._frame_phases = {}
+
+    def toggle_overlay(self):
+        """ Show or hide the overlay. """
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.requested or self.show_overlay
+        if not self.enabled:
+            self._frame_phases = {}
+            self._frame_start = None
+
+    def phase(self, name):
+        """ Context manager that times a phase. """
+        if not self.enabled:
+            return NULL_PHASE
+        return _Phase(self, name)
+
+    def record(self, name, start, end):
+        self.events.append((name, start, end))
+        self._frame_phases[name] = self._frame_phases.get(name, 0) + end - start
+
+    def begin_frame(self):
+        if self.enabled:
+            self._frame_start = default_timer()
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        end = default_timer()
+        self.events.append(("frame", self._frame_start, end))
+        self.frame_times.append(end - self._frame_start)
+        self.last_frame = self._frame_phases
+        self._frame_phases = {}
+        self._frame_start = None
+
+    def draw_overlay(self, screen, x=10, y=10):
+        """ Draw the frame time graph and the slowest phases of the last
+            frame. Returns the rect it covers. """
+        width = self.frame_times.maxlen * 2
+        height = GRAPH_HEIGHT + OVERLAY_LINES * OVERLAY_FONT_SIZE + 8
+        area = pygame.Rect(x, y, width, height)
+        screen.fill((0, 0, 0), area)
+
+        # One bar per frame, the line marks 60 frames per second
+        bottom = y + GRAPH_HEIGHT
+        for i, frame_time in enumerate(self.frame_times):
+            bar = min(GRAPH_HEIGHT, int(frame_time / GRAPH_SCALE * GRAPH_HEIGHT))
+            color = (0, 200, 0) if frame_time <= 1 / 60.0 else (220, 0, 0)
+            screen.fill(color, (x + i * 2, bottom - bar, 2, bar))
+        target = bottom - int(1 / 60.0 / GRAPH_SCALE * GRAPH_HEIGHT)
+        screen.fill((255, 255, 255), (x, target, width, 1))
+
+        lines = []
+        if self.frame_times:
+            lines.append("frame %.2f ms" % (self.frame_times[-1] * 1000))
+        slowest = sorted(self.last_frame.items(), key=lambda item: -item[1])
+        for name, seconds in slowest[:OVERLAY_LINES - 1]:
+            lines.append("%-22s %6.2f ms" % (name, seconds * 1000))
+        for i, line in enumerate(lines):
+            label = fonts.render(line, (255, 255, 255), HELP_FONT, OVERLAY_FONT_SIZE)
+            screen.blit(label, (x + 2, bottom + 4 + i * OVERLAY_FONT_SIZE))
+        return area
+
+    def chrome_trace(self):
+        """ The recorded phases in Chrome's trace event format. """
+        events = []
+        for name, start, end in self.events:
+            events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 1,
+                "tid": 1,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, file_name):
+        with open(file_name, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+
+# The profiler shared by the whole game
+profiler = Profiler()
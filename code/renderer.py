@@ -0,0 +1,141 @@
+"""
+Renderers used by the main loop.
+
+FullRenderer redraws the whole frame every tick. DirtyRenderer keeps a
+copy of the level background, remembers where every sprite was drawn
+and only repaints and presents the regions that changed. It falls back
+to a full redraw when the level scrolls.
+"""
+import pygame
+
+from profiler import profiler
+
+
+class FullRenderer(object):
+    """ Draws everything and flips the whole display every frame. """
+
+    def draw(self, screen, level, sprites, overlay):
+        """ Draw the level, the sprites in world coordinates on top of it,
+            and finally the overlay callable, which draws HUD elements
+            on the screen and returns the rects it covered. """
+        with profiler.phase("Level.draw"):
+            level.draw(screen)
+            level.camera.draw(screen, sprites)
+        with profiler.phase("messages"):
+            overlay(screen)
+
+    def present(self):
+        pygame.display.flip()
+
+
+class DirtyRenderer(object):
+    """ Repaints only the screen regions that changed since the last
+        frame and presents them with display.update(rects). """
+
+    def __init__(self):
+        # The level background at the current scroll, without sprites
+        self.background = None
+        self._background_valid = False
+        self._level = None
+        self._view_x = None
+        # sprite -> (image, screen rect) it was last drawn with
+        self._drawn = {}
+        # Rects covered by the overlay last frame
+        self._overlay_rects = []
+        # Regions to present, None means the whole display
+        self._update_rects = None
+
+    def _snapshot(self, groups, camera):
+        """ Where every sprite would be drawn on screen this frame. """
+        drawn = {}
+        order = []
+        for group in groups:
+            for sprite in camera.visible(group):
+                drawn[sprite] = (sprite.image, camera.screen_rect(sprite))
+                order.append(sprite)
+        return drawn, order
+
+    def _full_redraw(self, screen, level, order, drawn):
+        level.draw_background(screen)
+        for sprite in order:
+            image, rect = drawn[sprite]
+            screen.blit(image, rect)
+
+    def draw(self, screen, level, sprites, overlay):
+        """ Same arguments as FullRenderer.draw. """
+        groups = level.sprite_groups() + [sprites]
+        drawn, order = self._snapshot(groups, level.camera)
+
+        if level is not self._level or level.camera.view_x != self._view_x:
+            # Everything moved, draw straight to the screen and rebuild
+            # the cached background once the scrolling stops
+            self._level = level
+            self._view_x = level.camera.view_x
+            self._background_valid = False
+            with profiler.phase("Level.draw"):
+                self._full_redraw(screen, level, order, drawn)
+            with profiler.phase("messages"):
+                self._overlay_rects = overlay(screen)
+            self._drawn = drawn
+            self._update_rects = None
+            return
+
+        if not self._background_valid:
+            with profiler.phase("Level.draw"):
+                if self.background is None or self.background.get_size() != screen.get_size():
+                    self.background = pygame.Surface(screen.get_size()).convert()
+                level.draw_background(self.background)
+            self._background_valid = True
+
+        # Collect the regions where a sprite appeared, moved, changed
+        # its image or disappeared
+        dirty = list(self._overlay_rects)
+        for sprite, (image, rect) in drawn.items():
+            previous = self._drawn.pop(sprite, None)
+            if previous is None:
+                dirty.append(rect)
+            elif previous[0] is not image or previous[1] != rect:
+                dirty.append(previous[1])
+                dirty.append(rect)
+        for image, rect in self._drawn.values():
+            dirty.append(rect)
+        self._drawn = drawn
+
+        dirty = self._merge(dirty, screen.get_rect())
+
+        # Repaint every dirty region from the background up, clipped so
+        # sprites outside the region are left alone
+        with profiler.phase("Level.draw"):
+            for region in dirty:
+                screen.set_clip(region)
+                screen.blit(self.background, region, region)
+                for sprite in order:
+                    image, rect = drawn[sprite]
+                    if rect.colliderect(region):
+                        screen.blit(image, rect)
+            screen.set_clip(None)
+
+        with profiler.phase("messages"):
+            self._overlay_rects = overlay(screen)
+        self._update_rects = dirty + self._overlay_rects
+
+    @staticmethod
+    def _merge(rects, bounds):
+        """ Clip the rects to the screen and union the overlapping ones. """
+        merged = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if not rect.width or not rect.height:
+                continue
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def present(self):
+        if self._update_rects is None:
+            pygame.display.flip()
+        elif self._update_rects:
+            pygame.display.update(self._update_rects)
@@ -0,0 +1,135 @@
+"""
+Recording and replay of the input stream.
+
+The recorder stores every key press and release together with the
+simulation tick it was applied before. A replay feeds the same keys back
+through Game.handle_key at the same ticks, so it ends in exactly the
+same world state. The digest of that state is stored with the recording
+to check it.
+
+R (retry) and Backspace (rewind) aren't recorded, although they change
+the world. They send the game back to an earlier tick, and keys are
+stored by tick, so the abandoned future and the new one would end up
+mixed in one recording. Instead the recorder forgets what it recorded
+after the tick the game went back to, see Recorder.rewind. A recording
+holds only the timeline that was kept, and replays it without any
+retry or rewind.
+
+File layout, little endian:
+    header  "HNYR", format version (u8), ticks (u32), events (u32),
+            md5 digest of the final world state (16 bytes)
+    events  tick (u32), key index | 0x80 if pressed (u8)
+"""
+import hashlib
+import struct
+
+import pygame
+
+from husband import Husband
+from timing import sim_clock
+
+MAGIC = b"HNYR"
+VERSION = 1
+
+HEADER = struct.Struct("<4sBII16s")
+EVENT = struct.Struct("<IB")
+
+# The keys the game reacts to, stored by index. Retry and rewind are
+# left out on purpose, see above
+KEYS = [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_SPACE, pygame.K_ESCAPE]
+PRESSED = 0x80
+
+
+def world_state(game):
+    """ Everything in the world that the simulation changes, as a tuple
+        of plain values. """
+    player = game.player
+    level = game.current_level
+    if level.guard_engine:
+        level.guard_engine.sync_all()
+    state = [
+        sim_clock.ticks,
+        game.current_level_no,
+        level.camera.x,
+        tuple(player.rect), player.change_x, player.change_y,
+        player._enabled, player.hidden, player.direction,
+        Husband._suspicion_value, Husband._suspicion_delay,
+        game.dead, game.current_message, game.message_expire,
+    ]
+    for husband in game.bad_guys:
+        x, y, x0, y0, change_x, change_y, direction, frequency = level.patrol_state(husband)
+        state.append(((x, y, husband.rect.width, husband.rect.height), x0, change_x,
+                      direction, frequency, husband.alive()))
+    for the_thing in level.all_things():
+        state.append((type(the_thing).__name__, tuple(the_thing.rect),
+                      getattr(the_thing, "open", None), getattr(the_thing, "hidden", None),
+                      getattr(the_thing, "last_change", None),
+                      the_thing.image is getattr(the_thing, "fallen_image", None)))
+    return tuple(state)
+
+
+def digest(game):
+    """ md5 of the world state, equal for bit-identical worlds. """
+    return hashlib.md5(repr(world_state(game)).encode("utf-8")).digest()
+
+
+class Recorder(object):
+    """ Collects the keys handled by a game, see Game.recorder. """
+
+    def __init__(self):
+        # (tick, key, pressed) in the order they were handled
+        self.events = []
+
+    def record(self, tick, key, down):
+        if key in KEYS:
+            self.events.append((tick, key, down))
+
+    def rewind(self, tick):
+        """ Forget the keys handled after tick, the game went back to it
+            with a retry or rewind. """
+        while self.events and self.events[-1][0] > tick:
+            self.events.pop()
+
+    def save(self, file_name, game):
+        """ Write the recording, ending with the game's current state. """
+        with open(file_name, "wb") as replay_file:
+            replay_file.write(HEADER.pack(MAGIC, VERSION, sim_clock.ticks, len(self.events), digest(game)))
+            for tick, key, down in self.events:
+                replay_file.write(EVENT.pack(tick, KEYS.index(key) | (PRESSED if down else 0)))
+
+
+class Replay(object):
+    """ A loaded recording. """
+
+    def __init__(self, ticks, events, state_digest):
+        self.ticks = ticks
+        self.events = events
+        self.digest = state_digest
+
+    @property
+    def script(self):
+        """ tick -> [(key, down), ...], the format headless.run takes. """
+        script = {}
+        for tick, key, down in self.events:
+            script.setdefault(tick, []).append((key, down))
+        return script
+
+    def matches(self, game):
+        """ True if the game ended in the recorded state. """
+        return digest(game) == self.digest
+
+
+def load(file_name):
+    with open(file_name, "rb") as replay_file:
+        data = replay_file.read()
+    magic, version, ticks, count, state_digest = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("%s is not a replay this version can read" % file_name)
+
+    events = []
+    offset = HEADER.size
+    for i in range(count):
+        tick, code = EVENT.unpack_from(data, offset)
+        offset += EVENT.size
+        events.append((tick, KEYS[code & ~PRESSED], bool(code & PRESSED)))
+    return Replay(ticks, events, state_digest)
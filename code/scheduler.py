@@ -0,0 +1,72 @@
+"""
+Timers for the simulation, kept in a timing wheel.
+
+A thing with nothing to do until some later step asks to be called then,
+instead of comparing sim_clock.time with a time of its own every step.
+Timers go into the slot of the wheel for the tick they are due at and
+each step only the slot of that step is looked at, so waiting timers
+cost nothing. A timer further off than one turn of the wheel waits in
+its slot for as many turns as needed.
+"""
+from timing import sim_clock
+
+# Slots in the wheel, a turn is this many ticks
+WHEEL_SIZE = 256
+
+
+class Timer(object):
+    __slots__ = ("tick", "callback", "cancelled")
+
+    def __init__(self, tick, callback):
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimingWheel(object):
+
+    def __init__(self, size=WHEEL_SIZE):
+        self.slots = [[] for i in range(size)]
+        # Last tick whose timers were run
+        self.tick = 0
+
+    def reset(self, tick=0):
+        """ Drop every timer, for a new game. """
+        for slot in self.slots:
+            del slot[:]
+        self.tick = tick
+
+    def at(self, tick, callback):
+        """ Call callback at the given tick. Timers already due, or added
+            by a timer for its own tick, run at the next step. """
+        tick = max(tick, self.tick + 1)
+        timer = Timer(tick, callback)
+        self.slots[tick % len(self.slots)].append(timer)
+        return timer
+
+    def after(self, seconds, callback, since=None):
+        """ Call callback once more than seconds have passed since the
+            simulation time since, now by default. """
+        return self.at(sim_clock.tick_after(seconds, since), callback)
+
+    def run(self, tick):
+        """ Call the timers due up to the given tick, in the order they
+            were added. """
+        slots = self.slots
+        while self.tick < tick:
+            self.tick += 1
+            slot = slots[self.tick % len(slots)]
+            if not slot:
+                continue
+            due = [timer for timer in slot if timer.tick == self.tick]
+            slot[:] = [timer for timer in slot if timer.tick != self.tick]
+            for timer in due:
+                if not timer.cancelled:
+                    timer.callback()
+
+
+# The timers of the game, run once every simulation step
+scheduler = TimingWheel()
@@ -0,0 +1,192 @@
+"""
+Snapshots of the whole world, for instant retry and rewind.
+
+take() packs everything the simulation changes into a byte string: the
+player, every husband, the suspicion meter they share, the camera,
+things and moving platforms of every level, the messages on screen and
+the simulation time. The player and the husbands are fixed size records
+packed with struct, the rest goes through marshal. restore() puts a game back the way it
+was when the snapshot was taken, without building any level or sprite
+sheet again.
+
+Rewind keeps the newest snapshots of a game in a ring of fixed size,
+for Backspace in the windowed game.
+"""
+import marshal
+import struct
+
+from events import bus
+from husband import Husband, SightVolumes
+from lod import GuardLOD
+from scheduler import scheduler
+from timing import sim_clock, STEP
+
+VERSION = 1
+HEADER = struct.Struct("<BI")
+# x, y, direction, enabled, hidden. Speeds go through marshal, which
+# keeps ints and floats apart
+PLAYER = struct.Struct("<iic??")
+# x, y, x0, y0, change_x, change_y, direction, frame counter, alive,
+# chasing, chase until, goal node, home x, home y, home direction
+HUSBAND = struct.Struct("<iiiibbci??diiic")
+
+# Position of the player among the level's active sprites
+PLAYER_INDEX = -1
+
+
+def take(game):
+    """ The state of the world as a byte string. """
+    level = game.current_level
+    if level.guard_engine:
+        level.guard_engine.sync_all()
+
+    player = game.player
+    parts = [HEADER.pack(VERSION, len(game.bad_guys)),
+             PLAYER.pack(player.rect.x, player.rect.y, player.direction, player._enabled, player.hidden)]
+    for husband in game.bad_guys:
+        chasing = husband._home is not None
+        home_x, home_y, home_direction = husband._home if chasing else (0, 0, "L")
+        goal = husband._goal_node if husband._goal_node is not None else -1
+        x, y, x0, y0, change_x, change_y, direction, frequency = level.patrol_state(husband)
+        parts.append(HUSBAND.pack(x, y, x0, y0, change_x, change_y, direction, frequency, husband.alive(),
+                                  chasing, husband._chase_until or 0.0, goal,
+                                  home_x, home_y, home_direction))
+
+    index = dict(zip(game.bad_guys, range(len(game.bad_guys))))
+    index[player] = PLAYER_INDEX
+    levels = []
+    for each in game.level_list:
+        active = [index[sprite] for sprite in each.active_sprites]
+        moving = [(platform.rect.x, platform.rect.y, platform.change_x, platform.change_y)
+                  for platform in each.moving_platforms]
+        levels.append((each.camera.x, active, moving, each.thing_states()))
+
+    world = (sim_clock.ticks, game.current_level_no, game.dead, player.change_x, player.change_y,
+             game.current_message, game.message_expire, game.message_display_time, game.time_start,
+             game.messages,
+             Husband._suspicion_value, Husband._suspicion_delay, Husband._last_suspicion_meter_update,
+             game.active_sprite_list.has(player), bus.history(), levels)
+    parts.append(marshal.dumps(world))
+    return b"".join(parts)
+
+
+def restore(game, data):
+    """ Put the game back in the state of a snapshot from take(). """
+    version, count = HEADER.unpack_from(data, 0)
+    if version != VERSION or count != len(game.bad_guys):
+        raise ValueError("snapshot doesn't fit this game")
+    offset = HEADER.size
+    player_state = PLAYER.unpack_from(data, offset)
+    offset += PLAYER.size
+    husband_states = []
+    for i in range(count):
+        husband_states.append(HUSBAND.unpack_from(data, offset))
+        offset += HUSBAND.size
+    (ticks, level_no, dead, change_x, change_y,
+     message, message_expire, message_time, time_start, messages,
+     suspicion, suspicion_delay, suspicion_update, player_shown, history, levels) = marshal.loads(data[offset:])
+
+    # Time first, things that wait for it are set up again below
+    sim_clock.ticks = ticks
+    scheduler.reset(ticks)
+    bus.restore_history(history)
+    Husband._suspicion_value = suspicion
+    Husband._suspicion_delay = suspicion_delay
+    Husband._last_suspicion_meter_update = suspicion_update
+
+    game.current_level_no = level_no
+    game.current_level = game.level_list[level_no]
+    game.dead = dead
+    game.current_message = message
+    game.message_expire = message_expire
+    game.message_display_time = message_time
+    game.time_start = time_start
+    game.messages = list(messages)
+
+    player = game.player
+    player.level = game.current_level
+    player.rect.x, player.rect.y, player.direction, player._enabled, player.hidden = player_state
+    player.change_x = change_x
+    player.change_y = change_y
+    player.previous_position = None
+    game.active_sprite_list.empty()
+    if player_shown:
+        game.active_sprite_list.add(player)
+
+    alive = []
+    for husband, state in zip(game.bad_guys, husband_states):
+        (husband.rect.x, husband.rect.y, husband._x0, husband._y0,
+         husband._change_x, husband._change_y, husband._direction,
+         husband._sprite_frame_frequency, is_alive,
+         chasing, chase_until, goal, home_x, home_y, home_direction) = state
+        husband._chase_until = chase_until if chasing else None
+        husband._goal_node = goal if goal >= 0 else None
+        husband._home = (home_x, home_y, home_direction) if chasing else None
+        husband.previous_position = None
+        husband._choose_frame()
+        husband._update_sight()
+        if is_alive:
+            alive.append(husband)
+
+    sprites = dict((i, husband) for i, husband in enumerate(game.bad_guys))
+    sprites[PLAYER_INDEX] = player
+    for level, (camera_x, active, moving, things) in zip(game.level_list, levels):
+        level.camera.x = level.camera.previous_x = camera_x
+        for platform, state in zip(level.moving_platforms, moving):
+            platform.rect.x, platform.rect.y, platform.change_x, platform.change_y = state
+            platform.previous_position = None
+        level.enemy_list.empty()
+        level.enemy_list.add(*alive)
+        level.active_sprites.empty()
+        level.active_sprites.add(*[sprites[i] for i in active])
+        level.restore_things(things)
+        # Whatever the husband engines knew is out of date
+        level.sight_volumes = SightVolumes()
+        if level.guard_engine:
+            level.guard_engine.load(level.enemy_list)
+        if level.guard_lod:
+            level.guard_lod = GuardLOD()
+
+    if game.recorder:
+        game.recorder.rewind(ticks)
+
+
+class Rewind(object):
+    """ A snapshot of a game every few seconds of play, the ones of the
+        last seconds kept in a ring of fixed size. """
+
+    def __init__(self, seconds, every):
+        size = max(1, int(seconds / every))
+        # Tick each snapshot was taken at, None for empty slots
+        self.ticks = [None] * size
+        self.snapshots = [None] * size
+        # Steps between two snapshots
+        self.every = max(1, int(round(every / STEP)))
+        # Slot of the oldest snapshot
+        self._next = 0
+
+    def record(self, game):
+        """ Call after every step. """
+        if sim_clock.ticks % self.every:
+            return
+        self.ticks[self._next] = sim_clock.ticks
+        self.snapshots[self._next] = take(game)
+        self._next = (self._next + 1) % len(self.snapshots)
+
+    def back(self, game):
+        """ Go back to the newest snapshot older than now. Returns False
+            if there is none left. """
+        size = len(self.snapshots)
+        for i in range(size):
+            newest = (self._next - 1) % size
+            tick = self.ticks[newest]
+            if tick is None:
+                return False
+            if tick < sim_clock.ticks:
+                restore(game, self.snapshots[newest])
+                return True
+            # Taken now or in a future that was left behind, going back
+            # to it would change nothing
+            self.ticks[newest] = self.snapshots[newest] = None
+            self._next = newest
+        return False
@@ -0,0 +1,60 @@
+"""
+Uniform grid index used to find the sprites near a rectangle without
+scanning a whole sprite group.
+"""
+
+
+class SpatialHash(object):
+    """ Buckets sprites by the grid cells their rects cover. Meant for
+        sprites that don't move; call remove() and insert() again if one
+        does. """
+
+    def __init__(self, cell_size=70):
+        self.cell_size = cell_size
+        # (column, row) -> list of sprites overlapping that cell
+        self._cells = {}
+        # sprite -> cells it was inserted into
+        self._sprite_cells = {}
+
+    def __len__(self):
+        return len(self._sprite_cells)
+
+    def __iter__(self):
+        return iter(self._sprite_cells)
+
+    def _cells_for(self, rect):
+        size = self.cell_size
+        # right and bottom are exclusive, so an edge that sits exactly on
+        # a cell boundary doesn't reach into the next cell
+        for column in range(rect.left // size, (rect.right - 1) // size + 1):
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield column, row
+
+    def insert(self, sprite):
+        cells = list(self._cells_for(sprite.rect))
+        self._sprite_cells[sprite] = cells
+        for cell in cells:
+            self._cells.setdefault(cell, []).append(sprite)
+
+    def remove(self, sprite):
+        for cell in self._sprite_cells.pop(sprite, []):
+            bucket = self._cells[cell]
+            bucket.remove(sprite)
+            if not bucket:
+                del self._cells[cell]
+
+    def nearby(self, rect):
+        """ Sprites in the cells the rect covers, without duplicates. """
+        found = []
+        seen = set()
+        cells = self._cells
+        for cell in self._cells_for(rect):
+            for sprite in cells.get(cell, ()):
+                if sprite not in seen:
+                    seen.add(sprite)
+                    found.append(sprite)
+        return found
+
+    def query(self, rect):
+        """ Sprites whose rects overlap the rect. """
+        return [sprite for sprite in self.nearby(rect) if rect.colliderect(sprite.rect)]
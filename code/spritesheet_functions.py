@@ -4,32 +4,59 @@ This module is used to pull individual sprites from sprite sheets.
 import pygame
 
 import constants
+from assets import assets
+
+
+class FrameRegistry(object):
+    """ Hands out one surface per distinct image cut from a sprite sheet,
+        keyed by (sheet, rect, colorkey). Every sprite showing the same
+        frame shares the surface, so the surfaces must not be drawn on. """
+
+    def __init__(self):
+        self._frames = {}
+
+    def __len__(self):
+        return len(self._frames)
+
+    def image(self, file_name, x, y, width, height, colorkey=constants.BLACK):
+        key = (file_name, x, y, width, height, colorkey)
+        image = self._frames.get(key)
+        if image is None:
+            # Create a new blank image
+            image = pygame.Surface([width, height]).convert()
+
+            # Copy the sprite from the large sheet onto the smaller image
+            image.blit(assets.get(file_name), (0, 0), (x, y, width, height))
+
+            # Assuming black works as the transparent color
+            image.set_colorkey(colorkey)
+            self._frames[key] = image
+        return image
+
+    def strip(self, file_name, x, y, width, height, count, colorkey=constants.BLACK):
+        """ count frames side by side from x, y, as a tuple. """
+        return tuple(self.image(file_name, x + i * width, y, width, height, colorkey) for i in range(count))
+
+
+# The registry shared by every sprite
+frames = FrameRegistry()
 
 
 class SpriteSheet(object):
     """ Class used to grab images out of a sprite sheet. """
-    # This points to our sprite sheet image
-    sprite_sheet = None
 
     def __init__(self, file_name):
         """ Constructor. Pass in the file name of the sprite sheet. """
+        self.file_name = file_name
 
-        # Load the sprite sheet.
-        self.sprite_sheet = pygame.image.load(file_name).convert()
+    @property
+    def sprite_sheet(self):
+        # The sheet is decoded once and shared by every SpriteSheet
+        return assets.get(self.file_name)
 
     def get_image(self, x, y, width, height):
         """ Grab a single image out of a larger spritesheet
             Pass in the x, y location of the sprite
-            and the width and height of the sprite. """
-
-        # Create a new blank image
-        image = pygame.Surface([width, height]).convert()
-
-        # Copy the sprite from the large sheet onto the smaller image
-        image.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
-
-        # Assuming black works as the transparent color
-        image.set_colorkey(constants.BLACK)
-
-        # Return the image
-        return image
+            and the width and height of the sprite. The image is
+            shared with every other sprite using it. """
+        return frames.image(self.file_name, x, y, width, height)
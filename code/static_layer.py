@@ -0,0 +1,107 @@
+"""
+Pre-baked static layer of a level. The wallpaper and the wall tiles
+never change, so they are drawn once into fixed-width chunk surfaces
+and each frame only the chunks inside the viewport are blitted.
+
+Chunks are baked the first time they come into view and only the most
+recently drawn ones are kept, so long levels don't hold a surface for
+every chunk.
+"""
+from collections import OrderedDict
+
+import pygame
+
+import constants
+
+CHUNK_WIDTH = 512
+
+# How many baked chunks are kept, enough for a screen and some scrolling
+MAX_CHUNKS = 8
+
+# Color used for the transparent parts of a chunk
+TRANSPARENT = (255, 0, 255)
+
+
+class StaticLayer(object):
+    """ Level geometry compiled into vertical strips of CHUNK_WIDTH pixels. """
+
+    def __init__(self, chunk_width=CHUNK_WIDTH, max_chunks=MAX_CHUNKS):
+        self.chunk_width = chunk_width
+        self.max_chunks = max_chunks
+        # World x coordinate of the left edge of the first chunk
+        self.origin = 0
+        self.count = 0
+        # chunk index -> baked surface, least recently used first
+        self.chunks = OrderedDict()
+        # chunk index -> sprites that overlap it
+        self._sprites = {}
+        self._wallpaper_points = []
+        self._wallpaper_color = None
+
+    def build(self, sprites, wallpaper_points, wallpaper_color):
+        """ Sort the wallpaper polygon and the sprites, all given in world
+            coordinates, into chunks. """
+        self.chunks = OrderedDict()
+        self._sprites = {}
+        self._wallpaper_points = wallpaper_points
+        self._wallpaper_color = wallpaper_color
+
+        xs = [sprite.rect.left for sprite in sprites] + [p[0] for p in wallpaper_points]
+        rights = [sprite.rect.right for sprite in sprites] + [p[0] for p in wallpaper_points]
+        if not xs:
+            self.count = 0
+            return
+
+        self.origin = min(0, min(xs))
+        self.count = (max(rights) - self.origin) // self.chunk_width + 1
+
+        for sprite in sprites:
+            first = (sprite.rect.left - self.origin) // self.chunk_width
+            last = (sprite.rect.right - 1 - self.origin) // self.chunk_width
+            for i in range(first, last + 1):
+                self._sprites.setdefault(i, []).append(sprite)
+
+    def _bake(self, i):
+        left = self.origin + i * self.chunk_width
+        chunk = pygame.Surface([self.chunk_width, constants.SCREEN_HEIGHT]).convert()
+        chunk.fill(TRANSPARENT)
+
+        if len(self._wallpaper_points) > 2:
+            points = [(x - left, y) for x, y in self._wallpaper_points]
+            pygame.draw.polygon(chunk, self._wallpaper_color, points)
+
+        for sprite in self._sprites.get(i, ()):
+            x = sprite.rect.x - left
+            tiles = getattr(sprite, "tiles", 1)
+            if tiles == 1:
+                chunk.blit(sprite.image, (x, sprite.rect.y))
+                continue
+            # A run of tiles, only the ones on this chunk are drawn
+            tile_image = sprite.tile_image
+            width = tile_image.get_width()
+            for t in range(max(0, -x // width), min(tiles, (self.chunk_width - x) // width + 1)):
+                chunk.blit(tile_image, (x + t * width, sprite.rect.y))
+
+        chunk.set_colorkey(TRANSPARENT, pygame.RLEACCEL)
+        return chunk
+
+    def chunk(self, i):
+        """ The baked surface of chunk i. """
+        chunk = self.chunks.pop(i, None)
+        if chunk is None:
+            chunk = self._bake(i)
+            while len(self.chunks) >= self.max_chunks:
+                self.chunks.popitem(last=False)
+        self.chunks[i] = chunk
+        return chunk
+
+    def draw(self, screen, world_shift):
+        """ Blit the chunks that are visible with the given scroll. """
+        if not self.count:
+            return
+        left = -world_shift - self.origin
+        first = max(0, left // self.chunk_width)
+        last = min(self.count - 1, (left + screen.get_width() - 1) // self.chunk_width)
+        for i in range(first, last + 1):
+            x = self.origin + i * self.chunk_width + world_shift
+            screen.blit(self.chunk(i), (x, 0))
@@ -0,0 +1,161 @@
+"""
+Streams the things of a long level in and out around the camera.
+
+The map is cut into chunks a few screens wide. Only the things in the
+chunks around the camera exist as sprites. The others are dormant: all
+that is kept of them is the tuple from Thing.dormant_state, or nothing
+for tiles that were never visited. When a chunk comes within reach of
+the camera its things are made again and get their state back, when it
+falls behind they are dropped. Update and draw costs, and the memory
+held by sprites, then depend on the size of the screen and not on the
+length of the level.
+
+Chandeliers and their switches can be far apart and always exist.
+Husbands are not streamed, they patrol wherever they are.
+"""
+from timing import sim_clock
+
+# Width of a chunk in tiles
+CHUNK_TILES = 12
+# Chunks kept alive on each side of the screen
+MARGIN_CHUNKS = 1
+
+# Things that are never made dormant
+RESIDENT = "zj"
+
+# Dormant state of a tile without a thing, or whose thing is gone
+GONE = "gone"
+
+
+class ThingStream(object):
+
+    def __init__(self, level, compiled, chunk_tiles=CHUNK_TILES, margin=MARGIN_CHUNKS):
+        self.level = level
+        self.chunk_width = chunk_tiles * level.tileSize
+        self.margin = margin
+        self.count = len(compiled.tiles)
+        # chunk -> indexes of the tiles in it
+        self.chunks = {}
+        # tile index -> sprite for the things that exist
+        self.live = {}
+        # tile index -> dormant state, None for tiles never made
+        self.dormant = {}
+        # First and last chunk alive
+        self.window = None
+        # Things made later still count time from when the level was
+        self.start_time = sim_clock.time
+        # Tiles whose things are never made dormant
+        self.resident = set()
+
+        for index, (char, column, row) in enumerate(compiled.tiles):
+            if char in RESIDENT:
+                self.resident.add(index)
+                self._wake(index)
+            else:
+                self.chunks.setdefault(column // chunk_tiles, []).append(index)
+                self.dormant[index] = None
+
+        for switch, chandelier in compiled.chandelier_links:
+            self.live[switch].chandelier = self.live[chandelier]
+
+    def update(self, camera):
+        """ Wake the chunks that came within reach of the camera and put
+            the ones it left to sleep. """
+        first = (camera.x // self.chunk_width) - self.margin
+        last = ((camera.x + camera.width - 1) // self.chunk_width) + self.margin
+        if (first, last) == self.window:
+            return
+
+        if self.window:
+            old_first, old_last = self.window
+            for chunk in range(old_first, old_last + 1):
+                if chunk < first or chunk > last:
+                    for index in self.chunks.get(chunk, ()):
+                        self._sleep(index)
+            for chunk in range(first, last + 1):
+                if chunk < old_first or chunk > old_last:
+                    for index in self.chunks.get(chunk, ()):
+                        self._wake(index)
+        else:
+            for chunk in range(first, last + 1):
+                for index in self.chunks.get(chunk, ()):
+                    self._wake(index)
+        self.window = (first, last)
+
+    def _wake(self, index):
+        state = self.dormant.pop(index, None)
+        sprite = None
+        if state != GONE:
+            sprite = self._make(index, state)
+        if sprite is None:
+            self.dormant[index] = GONE
+            return
+        self.live[index] = sprite
+        self.level.add_thing(sprite)
+
+    def _sleep(self, index):
+        sprite = self.live.pop(index, None)
+        if sprite is None:
+            return
+        if sprite.alive():
+            self.dormant[index] = sprite.dormant_state()
+            self.level.remove_thing(sprite)
+        else:
+            # Picked up or otherwise removed, it doesn't come back
+            self.dormant[index] = GONE
+
+    def states(self):
+        """ The dormant state of every tile, including the ones whose
+            things are alive. """
+        states = []
+        for index in range(self.count):
+            sprite = self.live.get(index)
+            if sprite is None:
+                states.append(self.dormant.get(index))
+            elif sprite.alive():
+                states.append(sprite.dormant_state())
+            else:
+                states.append(GONE)
+        return states
+
+    def restore(self, states, camera):
+        """ Go back to the states of an earlier states(). The things near
+            the camera are made again from them. """
+        for index, state in enumerate(states):
+            if index in self.resident:
+                self.live[index].restore(state)
+                continue
+            sprite = self.live.pop(index, None)
+            if sprite is not None:
+                self.level.remove_thing(sprite)
+            self.dormant[index] = state
+        self.window = None
+        self.update(camera)
+
+    def all_things(self):
+        """ Every thing that still exists in map order. Dormant things are
+            made for the occasion, without adding them to the level. """
+        things = []
+        for index in range(self.count):
+            sprite = self.live.get(index)
+            if sprite is not None:
+                if sprite.alive():
+                    things.append(sprite)
+                continue
+            state = self.dormant.get(index)
+            if state == GONE:
+                continue
+            sprite = self._make(index, state)
+            if sprite is not None:
+                things.append(sprite)
+        return things
+
+    def _make(self, index, state):
+        sprite = self.level.make_thing(index)
+        if sprite is None:
+            return None
+        if state is not None:
+            sprite.restore(state)
+        elif hasattr(sprite, "last_change"):
+            sprite.last_change = self.start_time
+        return sprite
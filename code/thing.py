@@ -1,14 +1,17 @@
 """
 Module for managing platforms.
 """
-import time
 import pygame
-from pygame.event import Event
 import constants
+from events import bus, Message, Noise
 from husband import Husband
 from player import Player
 from husband import Husband
+from scheduler import scheduler
 from spritesheet_functions import SpriteSheet
+from timing import sim_clock
+
+LEVEL_COMPLETE = Message("LEVEL COMPLETE", 10)
 
 # These constants define our platform types:
 #   Name of file
@@ -42,6 +45,9 @@ CHANDELIER_SWITCH = (71, 142, 70, 70)
 class Thing(pygame.sprite.Sprite):
     """ Platform the user can jump on """
 
+    # Things that react to sprites touching them, see triggers.py
+    trigger = False
+
     def __init__(self, sprite_sheet_data, x, y, player):
         """ Platform constructor. Assumes constructed with user passing in
             an array of 5 numbers like what's defined at the top of this
@@ -60,36 +66,70 @@ class Thing(pygame.sprite.Sprite):
         self.rect.y = y
         self.player = player
 
+    def dormant_state(self):
+        """ What changed about this thing since it was made, as a tuple of
+            plain values, see restore. """
+        return ()
+
+    def restore(self, state):
+        """ Bring back a state from dormant_state on a newly made thing. """
+        pass
+
+    def on_enter(self, hits):
+        """ Sprites started touching the thing, hits is all that do. """
+        pass
+
+    def on_stay(self, hits):
+        """ Sprites still touch the thing. """
+        pass
+
+    def on_exit(self):
+        """ Nothing touches the thing any more. """
+        pass
+
 
 class ActionObject(Thing):
 
+    trigger = True
+
     def do_action(self, hit):
         raise NotImplementedError()
 
-    def update(self):
-        hit = pygame.sprite.spritecollideany(self, self.player)
+    def on_enter(self, hits):
+        hits = [hit for hit in hits if self.player.has(hit)]
+        hit = hits[0] if hits else None
         if hit and not hit._enabled:
             self.do_action(hit)
             hit.enable_movement()
 
+    on_stay = on_enter
+
 
 class Staircase(ActionObject):
     def __init__(self, sprite_sheet_data, x, y, player, door_number):
         super(Staircase, self).__init__(sprite_sheet_data, x, y, player)
         self.door_number = door_number
-        self.paired_door = None
+        # Top left of the staircase this one leads to. A position rather
+        # than the sprite, which may not exist while far from the camera.
+        self.paired_position = None
 
     def do_action(self, hit):
-        hit.rect.x = self.paired_door.rect.x
+        paired_x, paired_y = self.paired_position
+        hit.rect.x = paired_x
 
         if isinstance(hit, Player):
-            hit.rect.y = self.paired_door.rect.y
+            hit.rect.y = paired_y
         elif isinstance(hit, Husband):
-            hit.rect.y = self.paired_door.rect.y + 15
+            hit.rect.y = paired_y + 15
 
 
 class Wardrobe(Thing):
 
+    trigger = True
+
+    # Seconds between the frames of a wardrobe with the player inside
+    SHAKE_TIME = 1
+
     def __init__(self, sprite_sheet_data, x, y, player, closed_image, closed_image2):
         super(Wardrobe, self).__init__(sprite_sheet_data, x, y, player)
         self.hidden = False
@@ -97,55 +137,98 @@ class Wardrobe(Thing):
         sprite_sheet = SpriteSheet("img/things_spritesheet2.png")
         self.closed_image = sprite_sheet.get_image(*closed_image)
         self.closed_image2 = sprite_sheet.get_image(*closed_image2)
-        self.last_change = time.time()
+        self.last_change = sim_clock.time
+        # Next frame while hidden, see shake
+        self._timer = None
+
+    def dormant_state(self):
+        images = (self.open_image, self.closed_image, self.closed_image2)
+        return (self.hidden, self.last_change, images.index(self.image))
+
+    def restore(self, state):
+        self.hidden, self.last_change, image = state
+        self.image = (self.open_image, self.closed_image, self.closed_image2)[image]
+        if self.hidden:
+            self._shake_later()
 
-    def update(self):
-        hit = pygame.sprite.collide_rect(self, self.player)
-        if hit and not self.player._enabled and time.time() - self.last_change > 0.75:
+    def on_enter(self, hits):
+        hit = self.player in hits
+        if hit and not self.player._enabled and sim_clock.time - self.last_change > 0.75:
             if self.hidden:
                 self.image = self.open_image
                 self.player.show()
                 self.hidden = False
+                self._timer.cancel()
             else:
                 self.image = self.closed_image
                 self.player.hide()
                 self.hidden = True
-            self.last_change = time.time()
+            self.last_change = sim_clock.time
+            if self.hidden:
+                self._shake_later()
+            bus.publish(constants.WARDROBE_EVENT, Noise(*self.rect.center))
 
-        if self.hidden and time.time() - self.last_change > 1:
-            self.last_change = time.time()
-            if self.image == self.closed_image:
-                self.image = self.closed_image2
-            else:
-                self.image = self.closed_image
+    on_stay = on_enter
+
+    def _shake_later(self):
+        self._timer = scheduler.after(self.SHAKE_TIME, self.shake, self.last_change)
+
+    def shake(self):
+        """ Switch frames while the player hides inside. Called by the
+            scheduler, the wardrobe has nothing to do in between. """
+        if not self.hidden or not self.alive():
+            return
+        self.last_change = sim_clock.time
+        if self.image == self.closed_image:
+            self.image = self.closed_image2
+        else:
+            self.image = self.closed_image
+        self._shake_later()
 
 
 class Door(Thing):
     """ Door opens when you touch it and stays open """
+
+    trigger = True
+
     def __init__(self, sprite_sheet_data, x, y, player, open_image):
         super(Door, self).__init__(sprite_sheet_data, x, y, player)
         self.open = False
         self.closed_image = self.image
         sprite_sheet = SpriteSheet("img/things_spritesheet2.png")
         self.open_image = sprite_sheet.get_image(*open_image)
-        self.last_change = time.time()
+        self.last_change = sim_clock.time
+
+    def dormant_state(self):
+        return (self.open, self.last_change)
+
+    def restore(self, state):
+        self.open, self.last_change = state
+        self.image = self.open_image if self.open else self.closed_image
+
+    def on_enter(self, hits):
+        self.touched([hit for hit in hits if self.player.has(hit)])
 
-    def update(self):
-        hit = pygame.sprite.spritecollideany(self, self.player)
-        #print("hit: " + str(hit) + "  isOpen: " + str (self.open))
-        if hit and not self.open:
+    on_stay = on_enter
+
+    def on_exit(self):
+        self.touched([])
+
+    def touched(self, hits):
+        #print("hit: " + str(hits) + "  isOpen: " + str (self.open))
+        if hits and not self.open:
             self.image = self.open_image
             self.open = True
-        elif not hit and self.open:
+            bus.publish(constants.DOOR_EVENT, Noise(*self.rect.center))
+        elif not hits and self.open:
             self.image = self.closed_image
             self.open = False
 
 class FinalDoor(Door):
-    def update(self):
-        super(FinalDoor, self).update()
-        hit = pygame.sprite.spritecollideany(self, self.player)
-        if hit and isinstance(hit, Player):
-            pygame.event.post(Event(pygame.USEREVENT, {"action": constants.MESSAGE, "message": "LEVEL COMPLETE", "time": 10, "kill": True}))
+    def touched(self, hits):
+        super(FinalDoor, self).touched(hits)
+        if hits and isinstance(hits[0], Player):
+            bus.publish(constants.LEVEL_COMPLETE_EVENT, LEVEL_COMPLETE)
 
 
 class Clothing(ActionObject):
@@ -157,10 +240,16 @@ class Clothing(ActionObject):
 class Chandelier(ActionObject):
     def __init__(self, sprite_sheet_data, x, y, characters, fallen_image):
         super(Chandelier, self).__init__(sprite_sheet_data, x, y, characters)
-        self.fallen_image = fallen_image
+        self.hanging_image = self.image
         sprite_sheet = SpriteSheet("img/things_spritesheet2.png")
         self.fallen_image = sprite_sheet.get_image(*fallen_image)
 
+    def dormant_state(self):
+        return (self.image is self.fallen_image,)
+
+    def restore(self, state):
+        self.image = self.fallen_image if state[0] else self.hanging_image
+
     def do_action(self, hit):
         pass
 
@@ -181,6 +270,7 @@ class Chandelier(ActionObject):
         if thug:
             thug.kill()
         self.image = self.fallen_image
+        bus.publish(constants.CHANDELIER_EVENT, Noise(*self.rect.center))
 
 class ChandelierSwitch(ActionObject):
     def __init__(self, sprite_sheet_data, x, y, characters):
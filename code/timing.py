@@ -0,0 +1,67 @@
+"""
+Fixed-timestep simulation clock.
+
+Game logic advances in steps of exactly STEP seconds, however long a
+frame took to draw. Entities read sim_clock.time instead of time.time(),
+so slow frames don't change the outcome of the simulation.
+"""
+
+# Length of one simulation step, in seconds
+STEP = 1.0 / 60
+
+# Longest frame we try to catch up on, so a stall doesn't cause a long
+# burst of steps
+MAX_FRAME_TIME = 0.25
+
+
+class SimulationClock(object):
+    """ Counts simulation steps and accumulates real time until a whole
+        step is due. """
+
+    def __init__(self, step=STEP):
+        self.step = step
+        self.ticks = 0
+        # Real time not yet consumed by a step
+        self.accumulator = 0.0
+
+    @property
+    def time(self):
+        """ Simulation time in seconds. """
+        return self.ticks * self.step
+
+    @property
+    def alpha(self):
+        """ How far between the last step and the next one the current
+            frame is, from 0 to 1. Used to interpolate drawing. """
+        return self.accumulator / self.step
+
+    def reset(self):
+        self.ticks = 0
+        self.accumulator = 0.0
+
+    def tick_after(self, seconds, since=None):
+        """ First tick at which more than seconds have passed since the
+            simulation time since, now by default. """
+        if since is None:
+            since = self.time
+        tick = int((since + seconds) / self.step) - 1
+        while tick * self.step - since <= seconds:
+            tick += 1
+        return tick
+
+    def tick(self):
+        """ Advance the simulation by one step. """
+        self.ticks += 1
+
+    def steps(self, real_time):
+        """ Add the real time a frame took and yield once for every step
+            that is due, advancing the clock before each one. """
+        self.accumulator += min(real_time, MAX_FRAME_TIME)
+        while self.accumulator >= self.step:
+            self.accumulator -= self.step
+            self.tick()
+            yield self.ticks
+
+
+# The clock shared by the whole game
+sim_clock = SimulationClock()
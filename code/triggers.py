@@ -0,0 +1,67 @@
+"""
+Broadphase for the things sprites can touch.
+
+Doors, stairs, wardrobes and the rest never move, so they are put into a
+SpatialHash once. Every step the sprites that move look up the things
+under them, instead of every thing testing every sprite that moves. Only
+the things touched are called: on_enter the first step something touches
+them, on_stay while something does and on_exit at the step after the
+last one left. The cost of a step then depends on how many things are
+touched, not on how many there are.
+"""
+from spatial import SpatialHash
+
+
+class TriggerIndex(object):
+
+    def __init__(self, cell_size=70):
+        self.hash = SpatialHash(cell_size)
+        # trigger -> when it was added, callbacks run in that order like
+        # the updates of a sprite group
+        self._order = {}
+        self._added = 0
+        # Triggers that were touched at the last step
+        self._touching = set()
+
+    def __len__(self):
+        return len(self._order)
+
+    def add(self, trigger):
+        self.hash.insert(trigger)
+        self._order[trigger] = self._added
+        self._added += 1
+        # A thing made in a state that only lasts while it is touched,
+        # like an open door, hears about it at the next step if it isn't
+        self._touching.add(trigger)
+
+    def remove(self, trigger):
+        self.hash.remove(trigger)
+        self._order.pop(trigger, None)
+        self._touching.discard(trigger)
+
+    def update(self, movers):
+        """ Call the triggers touched by the sprites of movers. Each gets
+            the sprites on it in the order of the group, as they are when
+            it is called. """
+        hits = {}
+        for mover in movers:
+            for trigger in self.hash.query(mover.rect):
+                hits.setdefault(trigger, []).append(mover)
+
+        touching = set()
+        for trigger in sorted(self._touching.union(hits), key=self._order.__getitem__):
+            if not trigger.alive():
+                # Picked up or otherwise removed
+                self.remove(trigger)
+                continue
+            # Earlier triggers may have moved or removed some sprites
+            on = [mover for mover in hits.get(trigger, ()) if trigger.rect.colliderect(mover.rect)]
+            if on:
+                touching.add(trigger)
+                if trigger in self._touching:
+                    trigger.on_stay(on)
+                else:
+                    trigger.on_enter(on)
+            elif trigger in self._touching:
+                trigger.on_exit()
+        self._touching = touching